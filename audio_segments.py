@@ -0,0 +1,124 @@
+import io
+import os
+import sys
+import wave
+import shutil
+import subprocess
+from array import array
+from collections import namedtuple
+
+# ----------------------------
+# Splitting long recordings for parallel transcription
+# ----------------------------
+# split_audio cuts a recording into segments of roughly SEGMENT_SECONDS, placing
+# each cut in the quietest 20 ms window near the target so words are not split
+# in half. WAV is handled with the standard library; compressed uploads (the
+# browser's audio/webm) are decoded to 16 kHz mono PCM with ffmpeg when it is
+# installed. Audio that is short, or cannot be decoded, comes back as a single
+# segment unchanged.
+
+SEGMENT_SECONDS = float(os.environ.get("TRANSCRIBE_SEGMENT_SECONDS", "30"))
+SILENCE_SEARCH_SECONDS = 3.0
+WINDOW_SECONDS = 0.02
+
+DECODE_RATE = 16000
+# Below this size a compressed clip is well under two segments (Opus voice is
+# ~4 KB/s), so decoding it just to measure its length is not worth it.
+MIN_COMPRESSED_BYTES = 256 * 1024
+
+WAV_TYPES = {"audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave"}
+
+PcmFormat = namedtuple("PcmFormat", "nchannels sampwidth framerate")
+
+
+def split_audio(audio_bytes, content_type, segment_seconds=None):
+    """Return [(bytes, content_type), ...] in playback order; segment_seconds <= 0 disables splitting."""
+    whole = [(audio_bytes, content_type)]
+    if segment_seconds is None:
+        segment_seconds = SEGMENT_SECONDS
+    if segment_seconds <= 0:
+        return whole
+
+    if content_type in WAV_TYPES:
+        pcm = _read_wav(audio_bytes)
+    elif len(audio_bytes) >= MIN_COMPRESSED_BYTES:
+        pcm = _decode_with_ffmpeg(audio_bytes)
+    else:
+        pcm = None
+    if pcm is None:
+        return whole
+
+    frames, params = pcm
+    frame_width = params.sampwidth * params.nchannels
+    total = len(frames) // frame_width
+    segment_frames = int(segment_seconds * params.framerate)
+    if total < segment_frames * 1.5:
+        return whole
+
+    bounds = [0]
+    while total - bounds[-1] >= segment_frames * 1.5:
+        bounds.append(_quietest_cut(frames, params, bounds[-1] + segment_frames))
+    bounds.append(total)
+
+    return [
+        (_write_wav(frames[start * frame_width:end * frame_width], params), "audio/wav")
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+
+def _read_wav(audio_bytes):
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as reader:
+            params = PcmFormat(reader.getnchannels(), reader.getsampwidth(), reader.getframerate())
+            return reader.readframes(reader.getnframes()), params
+    except (wave.Error, EOFError):
+        return None
+
+
+def _decode_with_ffmpeg(audio_bytes):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+             "-ac", "1", "-ar", str(DECODE_RATE), "-f", "s16le", "pipe:1"],
+            input=audio_bytes, capture_output=True, timeout=30, check=True,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"⚠️ Could not decode audio for segmentation: {e}")
+        return None
+    return result.stdout, PcmFormat(1, 2, DECODE_RATE)
+
+
+def _write_wav(frames, params):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(params.nchannels)
+        writer.setsampwidth(params.sampwidth)
+        writer.setframerate(params.framerate)
+        writer.writeframes(frames)
+    return buffer.getvalue()
+
+
+def _quietest_cut(frames, params, target):
+    """Frame index of the quietest window within SILENCE_SEARCH_SECONDS of `target`."""
+    if params.sampwidth != 2:
+        return target  # Only 16-bit PCM is scanned; other widths are cut on the frame boundary.
+
+    window = max(1, int(WINDOW_SECONDS * params.framerate))
+    search = int(SILENCE_SEARCH_SECONDS * params.framerate)
+    channels = params.nchannels
+    start = max(0, target - search)
+    end = min(len(frames) // (2 * channels), target + search)
+
+    samples = array("h", frames[start * 2 * channels:end * 2 * channels])
+    if sys.byteorder == "big":
+        samples.byteswap()
+
+    best, best_energy = target, None
+    for offset in range(0, end - start - window + 1, window):
+        energy = sum(map(abs, samples[offset * channels:(offset + window) * channels]))
+        if best_energy is None or energy < best_energy:
+            best, best_energy = start + offset + window // 2, energy
+    return best
@@ -1,8 +1,17 @@
 import os
+import re
+import time
+import hashlib
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 
+_IMPORT_STARTED = time.perf_counter()
+
 # Load environment variables from .env file at the very beginning
 load_dotenv()
 
@@ -18,66 +27,499 @@ if creds_json:
         os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = f.name
     print("✅ Using Firebase credentials from GOOGLE_APPLICATION_CREDENTIALS_JSON")
 
-from google.cloud import firestore
-import google.generativeai as genai
-from google.cloud.firestore_v1.base_query import FieldFilter
-from zoo_model_1762023720806 import zoo_model, AnimalMonitoringData
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
+# Heavy clients (google.cloud.firestore, cloudinary, langchain/Gemini through the
+# AI model) are NOT imported here. They are loaded on first use, or by the
+# background warm-up started once the server is listening, so that gunicorn
+# boots and answers health checks quickly.
+from zoo_model_1762023720806 import get_zoo_model, observation_priority, AnimalMonitoringData
+from rate_limiter import get_gemini_limiter
+from singleflight import SingleFlight
+from response_layer import init_response_layer
+from idempotency import IDEMPOTENCY_WAIT_SECONDS, IN_PROGRESS, MISMATCH, StoredResponse, create_store
+from write_behind import create_buffer
+from resilience import (
+    RetryableStatusError,
+    circuit_states,
+    is_retryable_error,
+    resilient_call,
+    with_request_deadline,
+)
+
+# Same value as firestore.Query.DESCENDING, without importing the client at boot.
+DESCENDING = "DESCENDING"
 
 app = Flask(__name__)
 # Enable CORS to allow your React frontend to communicate with this API
 CORS(app)
+# orjson-backed jsonify plus gzip/brotli compression of large responses
+init_response_layer(app)
+
+# --- Startup Timing ---
+# Records how long each lazily loaded dependency took to initialise, so cold
+# start regressions show up in GET /startup and in the warm-up log line.
+startup_timings = {}
+
+@contextmanager
+def startup_step(name):
+    """Times one initialisation step and stores it in startup_timings."""
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = round(time.perf_counter() - began, 3)
+
+class LazyResource:
+    """Builds a heavy client on first use, exactly once, from any thread."""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.loaded = False
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    with startup_step(self.name):
+                        self._value = self.factory()
+                    self.loaded = True
+        return self._value
 
 # --- Firestore Database Initialization ---
-# The client will be initialized when the app starts.
+# The client is created on first use (or during warm-up).
 # It relies on the GOOGLE_APPLICATION_CREDENTIALS environment variable.
-credentials_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-try:
-    if not credentials_path:
-        raise ValueError("GOOGLE_APPLICATION_CREDENTIALS environment variable not set.")
-    if not os.path.exists(credentials_path):
-        raise FileNotFoundError(f"Service account key file not found at: {credentials_path}")
-    
-    db = firestore.Client.from_service_account_json(credentials_path)
-    print("✅ Firestore client initialized successfully using service account.")
-except Exception as e:
-    print(f"⚠️ Error initializing Firestore client: {e}")
-    print("🛑 API will run, but database functionality will be UNAVAILABLE.")
-    db = None
+def _init_firestore():
+    credentials_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    try:
+        if not credentials_path:
+            raise ValueError("GOOGLE_APPLICATION_CREDENTIALS environment variable not set.")
+        if not os.path.exists(credentials_path):
+            raise FileNotFoundError(f"Service account key file not found at: {credentials_path}")
+
+        from google.cloud import firestore
+        client = firestore.Client.from_service_account_json(credentials_path)
+        print("✅ Firestore client initialized successfully using service account.")
+        return client
+    except Exception as e:
+        print(f"⚠️ Error initializing Firestore client: {e}")
+        print("🛑 API will run, but database functionality will be UNAVAILABLE.")
+        return None
+
+_firestore_client = LazyResource("firestore", _init_firestore)
+db = None
+
+def get_db():
+    """Returns the Firestore client (None if unavailable), creating it on first use."""
+    global db
+    if db is None:
+        db = _firestore_client.get()
+    return db
+
+# --- Write-behind Inserts ---
+# With WRITE_BEHIND_JOURNAL set, observation and auto-alert inserts are journaled
+# locally and committed to Firestore in batches (see write_behind.py), so the
+# submit endpoints do not wait on Firestore round trips.
+_write_behind = create_buffer(get_db)
+
+def insert_document(collection, data):
+    """Adds `data` to `collection` (now, or via the write-behind journal); returns the document id."""
+    if _write_behind is not None:
+        return _write_behind.enqueue(collection, data)
+    _, doc_ref = get_db().collection(collection).add(data)
+    return doc_ref.id
+
+# --- Animal Name Cache ---
+# The submit endpoints need the animal's name for the AI prompt and for alert
+# messages. Names rarely change, so they are cached per worker for
+# ANIMAL_NAME_CACHE_SECONDS instead of costing a Firestore read per submission;
+# creating or updating an animal drops its entry.
+ANIMAL_NAME_CACHE_SECONDS = float(os.environ.get("ANIMAL_NAME_CACHE_SECONDS", "300"))
+_animal_names = {}
+_animal_names_lock = threading.Lock()
+
+def get_animal_name(animal_id):
+    """The animal's name, or "Unknown" when it cannot be found."""
+    db = get_db()
+    if not db or not animal_id:
+        return "Unknown"
+    now = time.monotonic()
+    with _animal_names_lock:
+        cached = _animal_names.get(animal_id)
+    if cached and now - cached[1] < ANIMAL_NAME_CACHE_SECONDS:
+        return cached[0]
+    try:
+        animal_doc = db.collection('animals').document(animal_id).get()
+    except Exception as e:
+        print(f"⚠️ Could not fetch animal name for ID {animal_id}: {e}")
+        return "Unknown"
+    name = animal_doc.to_dict().get('name', 'Unknown') if animal_doc.exists else "Unknown"
+    with _animal_names_lock:
+        _animal_names[animal_id] = (name, now)
+    return name
+
+def forget_animal_name(animal_id):
+    with _animal_names_lock:
+        _animal_names.pop(animal_id, None)
 
 # --- Cloudinary Initialization ---
-try:
-    cloudinary.config(
-        cloud_name = os.environ.get("CLOUDINARY_CLOUD_NAME"),
-        api_key = os.environ.get("CLOUDINARY_API_KEY"),
-        api_secret = os.environ.get("CLOUDINARY_API_SECRET"),
-        secure = True
-    )
-    if os.environ.get("CLOUDINARY_CLOUD_NAME"):
-        print("✅ Cloudinary client initialized successfully.")
+def _init_cloudinary():
+    import cloudinary
+    import cloudinary.uploader
+    try:
+        cloudinary.config(
+            cloud_name = os.environ.get("CLOUDINARY_CLOUD_NAME"),
+            api_key = os.environ.get("CLOUDINARY_API_KEY"),
+            api_secret = os.environ.get("CLOUDINARY_API_SECRET"),
+            secure = True
+        )
+        if os.environ.get("CLOUDINARY_CLOUD_NAME"):
+            print("✅ Cloudinary client initialized successfully.")
+        else:
+            print("⚠️ Cloudinary credentials not set in .env file. Media uploads will fail.")
+    except Exception as e:
+        print(f"⚠️ Error initializing Cloudinary client: {e}")
+    return cloudinary.uploader
+
+_cloudinary_uploader = LazyResource("cloudinary", _init_cloudinary)
+
+def get_cloudinary_uploader():
+    """Returns the configured cloudinary.uploader module, configuring it on first use."""
+    return _cloudinary_uploader.get()
+
+CLOUDINARY_TIMEOUT_SECONDS = 60
+
+def _is_retryable_cloudinary_status(status):
+    # 420 and 429 are Cloudinary's rate-limit replies.
+    return status in (420, 429) or status >= 500
+
+def _is_retryable_cloudinary_error(e):
+    # cloudinary.uploader reports transport failures as "Unexpected error" /
+    # "Socket error", and a reply that is not JSON (a 502/503 page from a proxy)
+    # as "Error parsing server response (<status>) ...".
+    import cloudinary.exceptions
+    if isinstance(e, cloudinary.exceptions.Error):
+        message = str(e)
+        if message.startswith(("Unexpected error", "Socket error")):
+            return True
+        status = re.match(r"Error parsing server response \((\d+)\)", message)
+        return bool(status) and _is_retryable_cloudinary_status(int(status.group(1)))
+    return is_retryable_error(e)
+
+def upload_to_cloudinary(file, resource_type="auto"):
+    """Uploads a file through the resilience layer (retries, circuit breaker, deadline)."""
+    import cloudinary.exceptions
+
+    uploader = get_cloudinary_uploader()
+
+    def send(timeout):
+        file.seek(0)  # A retry must re-send the whole file
+        # return_error=True hands back JSON error replies with their status code
+        # instead of raising them as a bare message.
+        result = uploader.upload(file, resource_type=resource_type, timeout=timeout, return_error=True)
+        error = result.get("error")
+        if error:
+            if _is_retryable_cloudinary_status(error.get("http_code", 0)):
+                raise RetryableStatusError("cloudinary", error["http_code"])
+            raise cloudinary.exceptions.Error(error.get("message"))
+        return result
+
+    return resilient_call("cloudinary", send, timeout=CLOUDINARY_TIMEOUT_SECONDS, retryable=_is_retryable_cloudinary_error)
+
+# --- AI Model ---
+_ai_model = LazyResource("ai_model", get_zoo_model)
+
+def get_ai_model():
+    """Returns the shared ZooAIModel, building it (langchain, Gemini) on first use."""
+    return _ai_model.get()
+
+# --- Background Warm-up ---
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+def warm_up():
+    """Loads every lazy dependency and prints a startup-time breakdown."""
+    get_db()
+    get_cloudinary_uploader()
+    get_ai_model()
+    print(f"🚀 Warm-up complete: {startup_report()}")
+
+def start_background_warmup():
+    """
+    Starts warm_up() on a daemon thread, once per process. Called after the
+    server is listening (gunicorn post_worker_init hook, or __main__), so the
+    first requests are not blocked behind it. Disable with WARMUP_ON_START=false.
+    The write-behind flusher is started either way, so that anything journaled
+    before a restart is replayed without waiting for the next submission.
+    """
+    global _warmup_thread
+    if _write_behind is not None:
+        _write_behind.start()
+    if os.environ.get("WARMUP_ON_START", "true").lower() != "true":
+        return
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+            _warmup_thread.start()
+
+def startup_report():
+    """Returns the startup-time breakdown in seconds."""
+    return {
+        "module_import": startup_timings.get("module_import"),
+        "firestore": startup_timings.get("firestore"),
+        "cloudinary": startup_timings.get("cloudinary"),
+        "ai_model": startup_timings.get("ai_model"),
+        "ready": _firestore_client.loaded and _cloudinary_uploader.loaded and _ai_model.loaded,
+    }
+
+# --- Read Coalescing ---
+# Dashboards poll the same lists at the same moment (e.g. at shift start).
+# Concurrent identical GETs share one Firestore read and its serialized body,
+# so backend load follows the number of distinct queries, not of clients.
+_read_flights = SingleFlight()
+
+def coalesce_reads(view):
+    """Decorator for GET list handlers; the key is the path plus query string."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        def run():
+            response = app.make_response(view(*args, **kwargs))
+            return response.get_data(), response.status_code, response.mimetype
+
+        (body, status, mimetype), shared = _read_flights.do(request.full_path, run)
+        response = app.response_class(body, status=status, mimetype=mimetype)
+        if shared:
+            response.headers['X-Coalesced'] = '1'
+        return response
+    return wrapper
+
+# --- Idempotency Keys ---
+# POST endpoints honour an `Idempotency-Key` header (see idempotency.py). Keys
+# are scoped to the endpoint path; reusing a key with a different payload is
+# rejected with 422.
+_idempotency_store = create_store()
+
+def _request_fingerprint():
+    """Hash of the method and payload. Multipart bodies are hashed as form fields plus file digests."""
+    digest = hashlib.sha256(request.method.encode())
+    if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f"\0form\0{name}\0{value}".encode())
+        for name, file in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f"\0file\0{name}\0{file.filename}\0{file.mimetype}\0".encode())
+            file_digest = hashlib.sha256()
+            for chunk in iter(lambda: file.stream.read(1024 * 1024), b''):
+                file_digest.update(chunk)
+            digest.update(file_digest.digest())
+            file.stream.seek(0)  # The view reads the file again
     else:
-        print("⚠️ Cloudinary credentials not set in .env file. Media uploads will fail.")
-except Exception as e:
-    print(f"⚠️ Error initializing Cloudinary client: {e}")
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+def _replay(stored):
+    response = app.response_class(stored.body, status=stored.status, mimetype=stored.mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def _begin_idempotent_request():
+    """Returns (scoped_key, None) to run the view, or (None, response) to answer at once."""
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return None, None
+    scoped_key = f"{request.path}:{key}"
+    fingerprint = _request_fingerprint()
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        state, stored = _idempotency_store.begin(scoped_key, fingerprint)
+        if state == MISMATCH:
+            return None, (jsonify({"error": "Idempotency-Key was already used for a different request"}), 422)
+        if state == IN_PROGRESS:
+            stored = _idempotency_store.wait(scoped_key, timeout=max(0.0, deadline - time.monotonic()))
+            if stored is None:
+                if time.monotonic() >= deadline:
+                    return None, (jsonify({"error": "A request with this Idempotency-Key is still being processed"}), 409)
+                continue  # The first attempt failed and was abandoned; take over the work.
+        if stored is not None:
+            return None, _replay(stored)
+        return scoped_key, None
+
+def _finish_idempotent_request(scoped_key, response):
+    if response.status_code >= 500:
+        _idempotency_store.abandon(scoped_key)
+    else:
+        _idempotency_store.complete(scoped_key, StoredResponse(
+            response.get_data(), response.status_code, response.mimetype
+        ))
+    return response
+
+def idempotent(view):
+    """Decorator making a POST handler safe to retry with an Idempotency-Key."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        scoped_key, early_response = _begin_idempotent_request()
+        if early_response is not None:
+            return early_response
+        if scoped_key is None:
+            return view(*args, **kwargs)
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            _idempotency_store.abandon(scoped_key)
+            raise
+        return _finish_idempotent_request(scoped_key, response)
+    return wrapper
+
+# --- Query Parameters ---
+class InvalidQueryParameter(ValueError):
+    """A list endpoint was given a query parameter it cannot honour (answered with 400)."""
+
+@app.errorhandler(InvalidQueryParameter)
+def handle_invalid_query_parameter(e):
+    return jsonify({"error": str(e)}), 400
+
+# Fields each list endpoint may project with ?fields=a,b,c. Projection maps to a
+# Firestore select(), so unrequested fields (AI summaries, media URLs) are never
+# read, decoded or serialized.
+OBSERVATION_FIELDS = set(AnimalMonitoringData.model_fields) | {
+    'animalId', 'animalName', 'submittedBy', 'createdAt', 'healthStatus', 'moodPercentage',
+    'appetitePercentage', 'movementPercentage', 'injuriesText', 'generalObservationText',
+    'observationText', 'imageUrl', 'videoUrl', 'gateImageUrl', 'enclosure',
+}
+PROJECTABLE_FIELDS = {
+    'animals': {'id', 'number', 'name', 'species', 'age', 'enclosure', 'image', 'health',
+                'lastChecked', 'assignedTo', 'mood', 'appetite', 'notes'},
+    'observations': OBSERVATION_FIELDS,
+    'inventory': {'name', 'category', 'quantity', 'unit', 'minThreshold', 'cost', 'supplier',
+                  'expiryDate', 'lastRestocked', 'isLowStock', 'expiryBucket'},
+    'medications': {'animalId', 'animalName', 'medicationName', 'dosage', 'frequency', 'startDate',
+                    'endDate', 'prescribedBy', 'purpose', 'status', 'administrationLog', 'notes',
+                    'createdAt'},
+    'alerts': {'type', 'message', 'animalName', 'location', 'status', 'createdAt', 'createdBy'},
+    'feeding_records': {'animalId', 'animalName', 'feedType', 'amount', 'cost', 'status',
+                        'recordedAt', 'recordedBy', 'notes'},
+}
+# Always returned with a projection (animals keep their ID inside the document).
+ALWAYS_PROJECTED = {'animals': ['id']}
+
+def requested_fields(collection):
+    """Parses ?fields= for a collection; None means the full document."""
+    fields_param = request.args.get('fields')
+    if not fields_param:
+        return None
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown = sorted(set(fields) - PROJECTABLE_FIELDS[collection])
+    if unknown:
+        raise InvalidQueryParameter(f"Unknown field(s) for {collection}: {', '.join(unknown)}")
+    for field in ALWAYS_PROJECTED.get(collection, []):
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+# Server-side filters per list endpoint: equality filters on the listed fields,
+# plus ?from= / ?to= as a range on the collection's date field (the same field
+# the endpoint orders by). Combinations are backed by composite indexes in
+# firestore.indexes.json.
+FILTERABLE_FIELDS = {
+    'observations': {'date_field': 'createdAt', 'equality': {'animalId': 'animalId'}},
+    'alerts': {'date_field': 'createdAt', 'equality': {'status': 'status', 'type': 'type'}},
+    'medications': {'date_field': 'startDate', 'equality': {'animalId': 'animalId', 'status': 'status'}},
+    'feeding_records': {'date_field': 'recordedAt', 'equality': {'animalId': 'animalId', 'status': 'status'}},
+}
+
+def _parse_date_param(name):
+    """
+    Validates ?from= / ?to= (YYYY-MM-DD or a full ISO 8601 timestamp). Stored
+    timestamps are UTC strings in two shapes: naive datetime.utcnow().isoformat()
+    from the server, and the browser's toISOString() ("...T10:00:00.000Z"), e.g.
+    observation createdAt. Both start with YYYY-MM-DDTHH:MM:SS, so timestamps
+    are converted to naive UTC and returned in that shape to compare as strings.
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise InvalidQueryParameter(f"'{name}' must be an ISO 8601 date or timestamp")
+    if len(value) == 10:
+        return value, parsed
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(), parsed
+
+def apply_filters(query, collection):
+    """Turns the collection's filter query parameters into Firestore where() clauses."""
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    spec = FILTERABLE_FIELDS[collection]
+    for param, field in spec['equality'].items():
+        value = request.args.get(param)
+        if value:
+            query = query.where(filter=FieldFilter(field, '==', value))
+
+    # Dates are stored as ISO 8601 strings, so string ranges sort chronologically.
+    date_from = _parse_date_param('from')
+    if date_from:
+        query = query.where(filter=FieldFilter(spec['date_field'], '>=', date_from[0]))
+    date_to = _parse_date_param('to')
+    if date_to:
+        value, parsed = date_to
+        if len(value) == 10:
+            # A bare date includes the whole day.
+            query = query.where(filter=FieldFilter(spec['date_field'], '<', (parsed + timedelta(days=1)).date().isoformat()))
+        else:
+            # Stored values carry fractions and suffixes ("10:00:00.000Z" > "10:00:00"
+            # as strings), so compare against the start of the next second.
+            next_second = parsed.replace(microsecond=0) + timedelta(seconds=1)
+            query = query.where(filter=FieldFilter(spec['date_field'], '<', next_second.isoformat()))
+    return query
+
+def project(query, fields):
+    """Applies a select() projection when fields were requested."""
+    return query.select(fields) if fields else query
 
 # --- API Endpoints ---
 
 @app.route('/')
 def health_check():
-    """A simple endpoint to confirm the API is running."""
-    return jsonify({"status": "Jungle Safari Backend API is running!", "database_connected": db is not None})
+    """A simple endpoint to confirm the API is running. Never waits on lazy clients."""
+    return jsonify({
+        "status": "Jungle Safari Backend API is running!",
+        "database_connected": db is not None,
+        "write_behind": _write_behind.stats() if _write_behind is not None else None,
+    })
+
+@app.route('/startup', methods=['GET'])
+def get_startup_report():
+    """Returns the cold-start breakdown (seconds spent loading each dependency)."""
+    return jsonify(startup_report()), 200
+
+@app.route('/ai/usage', methods=['GET'])
+def get_ai_usage():
+    """Returns Gemini token and latency totals per output mode (prompt vs schema)."""
+    zoo_model = get_ai_model()
+    limiter = get_gemini_limiter()
+    return jsonify({
+        "output_mode": zoo_model.output_mode,
+        "usage": zoo_model.usage.snapshot(),
+        "circuits": circuit_states(),
+        "transcript_cache": zoo_model.transcript_cache.stats(),
+        "rate_limiter": limiter.metrics() if limiter else None,
+    }), 200
 
 @app.route('/animals', methods=['GET'])
+@coalesce_reads
 def get_animals():
     """Fetches all animals from the Firestore database."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
-    
+
+    fields = requested_fields('animals')
     try:
         animals_ref = db.collection('animals')
-        docs = animals_ref.stream()
+        docs = project(animals_ref, fields).stream()
         
         animals = [doc.to_dict() for doc in docs]
         return jsonify(animals), 200
@@ -86,8 +528,10 @@ def get_animals():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/animals', methods=['POST'])
+@idempotent
 def create_animal():
     """Creates a new animal in the database."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -98,7 +542,7 @@ def create_animal():
     try:
         animals_ref = db.collection('animals')
         # Find the highest existing number to increment it
-        docs = animals_ref.order_by('id', direction=firestore.Query.DESCENDING).limit(1).stream()
+        docs = animals_ref.order_by('id', direction=DESCENDING).limit(1).stream()
         last_animal = next(docs, None)
         if last_animal:
             last_id = last_animal.id
@@ -112,6 +556,7 @@ def create_animal():
         data['number'] = str(new_num).zfill(3)
 
         animals_ref.document(new_id).set(data)
+        forget_animal_name(new_id)
         return jsonify(data), 201
     except Exception as e:
         print(f"❌ Error creating animal: {e}")
@@ -120,16 +565,20 @@ def create_animal():
 @app.route('/animals/<animal_id>', methods=['PUT'])
 def update_animal(animal_id):
     """Updates an animal's details in the database."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
     data = request.get_json()
     db.collection('animals').document(animal_id).update(data)
+    forget_animal_name(animal_id)
     return jsonify({"success": True, "updated_data": data}), 200
 
 @app.route('/users', methods=['GET'])
+@coalesce_reads
 def get_users():
     """Fetches all users from the Firestore database."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -149,8 +598,10 @@ def get_users():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/users', methods=['POST'])
+@idempotent
 def create_user():
     """Creates a new user in the Firestore database."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -172,6 +623,7 @@ def create_user():
 @app.route('/users/<user_id>', methods=['DELETE'])
 def delete_user(user_id):
     """Deletes a user from the Firestore database."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     db.collection('users').document(user_id).delete()
@@ -180,6 +632,7 @@ def delete_user(user_id):
 @app.route('/login', methods=['POST'])
 def login_user():
     """Authenticates a user based on name and password."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
 
@@ -214,15 +667,19 @@ def login_user():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/observations', methods=['GET'])
+@coalesce_reads
 def get_observations():
-    """Fetches all observation logs from the Firestore database."""
+    """Fetches observation logs, optionally filtered by animalId and from/to dates."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
-    
+
+    fields = requested_fields('observations')
     try:
         obs_ref = db.collection('observations')
         # Order by creation date, newest first
-        docs = obs_ref.order_by('createdAt', direction=firestore.Query.DESCENDING).stream()
+        query = apply_filters(obs_ref.order_by('createdAt', direction=DESCENDING), 'observations')
+        docs = project(query, fields).stream()
         
         observations = []
         for doc in docs:
@@ -231,19 +688,24 @@ def get_observations():
             observations.append(obs_data)
             
         return jsonify(observations), 200
+    except InvalidQueryParameter:
+        raise
     except Exception as e:
         print(f"❌ Error fetching observations: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/inventory', methods=['GET'])
+@coalesce_reads
 def get_inventory():
     """Fetches all inventory items from the Firestore database."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
-    
+
+    fields = requested_fields('inventory')
     try:
         inventory_ref = db.collection('inventory')
-        docs = inventory_ref.order_by('name').stream()
+        docs = project(inventory_ref.order_by('name'), fields).stream()
         
         inventory = []
         for doc in docs:
@@ -256,9 +718,123 @@ def get_inventory():
         print(f"❌ Error fetching inventory: {e}")
         return jsonify({"error": str(e)}), 500
 
+# --- Inventory Alert Index ---
+# Every inventory document carries two denormalized fields that are kept up to
+# date on each write: `isLowStock` (quantity below minThreshold) and
+# `expiryBucket` (the expiry date as a sortable YYYY-MM-DD key). Low-stock and
+# expiring items can then be found with indexed queries instead of a full scan.
+EXPIRY_WARNING_DAYS = int(os.environ.get("INVENTORY_EXPIRY_WARNING_DAYS", "30"))
+INVENTORY_AUTO_ALERTS = os.environ.get("INVENTORY_AUTO_ALERTS", "true").lower() == "true"
+
+def _to_number(value):
+    """Converts a stored quantity/threshold to a float, or None if it is not numeric."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def compute_inventory_index(item):
+    """Returns the denormalized alert-index fields for an inventory item."""
+    quantity = _to_number(item.get('quantity'))
+    min_threshold = _to_number(item.get('minThreshold'))
+    is_low_stock = quantity is not None and min_threshold is not None and quantity < min_threshold
+
+    expiry_bucket = None
+    expiry_date = item.get('expiryDate')
+    if expiry_date:
+        # Dates from the form are already YYYY-MM-DD; full timestamps are cut down to the day.
+        expiry_bucket = str(expiry_date)[:10]
+
+    return {'isLowStock': is_low_stock, 'expiryBucket': expiry_bucket}
+
+def raise_low_stock_alert(item):
+    """Creates an inventory alert when an item has just dropped below its threshold."""
+    db = get_db()
+    if not INVENTORY_AUTO_ALERTS or not db:
+        return
+    try:
+        alert_payload = {
+            'type': 'inventory',
+            'message': f"Low stock: {item.get('name', 'Unknown item')} is at {item.get('quantity')} {item.get('unit', '')} (minimum {item.get('minThreshold')}).",
+            'location': item.get('category', 'N/A'),
+            'status': 'active',
+            'createdAt': datetime.utcnow().isoformat(),
+            'createdBy': 'System (Auto-generated)'
+        }
+        db.collection('alerts').add(alert_payload)
+        print(f"✅ Auto-generated low stock alert for {item.get('name')}.")
+    except Exception as alert_e:
+        print(f"⚠️ Failed to auto-generate low stock alert: {alert_e}")
+
+@app.route('/inventory/alerts', methods=['GET'])
+@coalesce_reads
+def get_inventory_alerts():
+    """
+    Returns low-stock items and items expiring within `days` (default
+    INVENTORY_EXPIRY_WARNING_DAYS), using the denormalized index fields.
+    """
+    db = get_db()
+    if not db:
+        return jsonify({"error": "Database not connected"}), 500
+
+    try:
+        days = int(request.args.get('days', EXPIRY_WARNING_DAYS))
+    except ValueError:
+        return jsonify({"error": "'days' must be an integer"}), 400
+
+    try:
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        inventory_ref = db.collection('inventory')
+        today = datetime.utcnow().date().isoformat()
+        cutoff = (datetime.utcnow() + timedelta(days=days)).date().isoformat()
+
+        low_stock = []
+        for doc in inventory_ref.where(filter=FieldFilter('isLowStock', '==', True)).stream():
+            item_data = doc.to_dict()
+            item_data['id'] = doc.id
+            low_stock.append(item_data)
+
+        expiring_soon = []
+        expired = []
+        expiry_query = inventory_ref.where(filter=FieldFilter('expiryBucket', '<=', cutoff)).order_by('expiryBucket')
+        for doc in expiry_query.stream():
+            item_data = doc.to_dict()
+            item_data['id'] = doc.id
+            if item_data['expiryBucket'] < today:
+                expired.append(item_data)
+            else:
+                expiring_soon.append(item_data)
+
+        return jsonify({"lowStock": low_stock, "expiringSoon": expiring_soon, "expired": expired}), 200
+    except Exception as e:
+        print(f"❌ Error fetching inventory alerts: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/inventory/reindex', methods=['POST'])
+def reindex_inventory():
+    """Recomputes the alert-index fields for every inventory item (one-off backfill)."""
+    db = get_db()
+    if not db:
+        return jsonify({"error": "Database not connected"}), 500
+
+    try:
+        updated = 0
+        for doc in db.collection('inventory').stream():
+            item_data = doc.to_dict()
+            index_fields = compute_inventory_index(item_data)
+            if any(item_data.get(key) != value for key, value in index_fields.items()):
+                doc.reference.update(index_fields)
+                updated += 1
+        return jsonify({"success": True, "updated": updated}), 200
+    except Exception as e:
+        print(f"❌ Error reindexing inventory: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/inventory', methods=['POST'])
+@idempotent
 def create_inventory_item():
     """Creates a new inventory item."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -267,11 +843,13 @@ def create_inventory_item():
         return jsonify({"error": "Missing required inventory data"}), 400
         
     try:
-        from datetime import datetime
         data['lastRestocked'] = datetime.utcnow().isoformat()
+        data.update(compute_inventory_index(data))
         doc_ref_tuple = db.collection('inventory').add(data)
         new_item = data
         new_item['id'] = doc_ref_tuple[1].id
+        if new_item['isLowStock']:
+            raise_low_stock_alert(new_item)
         return jsonify(new_item), 201
     except Exception as e:
         print(f"❌ Error creating inventory item: {e}")
@@ -280,15 +858,37 @@ def create_inventory_item():
 @app.route('/inventory/<item_id>', methods=['PUT'])
 def update_inventory_item(item_id):
     """Updates an inventory item."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
+    from google.cloud import firestore
+
     data = request.get_json()
-    db.collection('inventory').document(item_id).update(data)
-    return jsonify({"success": True, "updated_data": data}), 200
+    item_ref = db.collection('inventory').document(item_id)
+
+    # Read, index and write in one transaction so concurrent updates cannot
+    # leave a stale index or both see the drop below the threshold.
+    @firestore.transactional
+    def apply_update(transaction):
+        current = item_ref.get(transaction=transaction)
+        current_data = current.to_dict() if current.exists else {}
+        updated = {**data, **compute_inventory_index({**current_data, **data})}
+        transaction.update(item_ref, updated)
+        return current_data, updated
+
+    try:
+        current_data, updated = apply_update(db.transaction())
+        if updated['isLowStock'] and not current_data.get('isLowStock'):
+            raise_low_stock_alert({**current_data, **updated})
+        return jsonify({"success": True, "updated_data": updated}), 200
+    except Exception as e:
+        print(f"❌ Error updating inventory item: {e}")
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/inventory/<item_id>', methods=['DELETE'])
 def delete_inventory_item(item_id):
     """Deletes an inventory item."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -296,14 +896,18 @@ def delete_inventory_item(item_id):
     return jsonify({"success": True}), 200
 
 @app.route('/medications', methods=['GET'])
+@coalesce_reads
 def get_medications():
-    """Fetches all medication items from the Firestore database."""
+    """Fetches medications, optionally filtered by animalId, status and from/to start dates."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
-    
+
+    fields = requested_fields('medications')
     try:
         meds_ref = db.collection('medications')
-        docs = meds_ref.order_by('startDate', direction=firestore.Query.DESCENDING).stream()
+        query = apply_filters(meds_ref.order_by('startDate', direction=DESCENDING), 'medications')
+        docs = project(query, fields).stream()
         
         medications = []
         for doc in docs:
@@ -312,13 +916,17 @@ def get_medications():
             medications.append(med_data)
             
         return jsonify(medications), 200
+    except InvalidQueryParameter:
+        raise
     except Exception as e:
         print(f"❌ Error fetching medications: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/medications', methods=['POST'])
+@idempotent
 def create_medication():
     """Creates a new medication prescription."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -342,6 +950,7 @@ def create_medication():
 @app.route('/medications/<medication_id>', methods=['PUT'])
 def update_medication(medication_id):
     """Updates a medication item (e.g., status, admin log)."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     data = request.get_json()
@@ -351,21 +960,26 @@ def update_medication(medication_id):
 @app.route('/medications/<medication_id>', methods=['DELETE'])
 def delete_medication(medication_id):
     """Deletes a medication prescription."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     db.collection('medications').document(medication_id).delete()
     return jsonify({"success": True}), 200
 
 @app.route('/alerts', methods=['GET'])
+@coalesce_reads
 def get_alerts():
-    """Fetches all alerts from the Firestore database."""
+    """Fetches alerts, optionally filtered by status, type and from/to dates."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
-    
+
+    fields = requested_fields('alerts')
     try:
         alerts_ref = db.collection('alerts')
         # Order by creation time, newest first
-        docs = alerts_ref.order_by('createdAt', direction=firestore.Query.DESCENDING).stream()
+        query = apply_filters(alerts_ref.order_by('createdAt', direction=DESCENDING), 'alerts')
+        docs = project(query, fields).stream()
         
         alerts = []
         for doc in docs:
@@ -374,13 +988,17 @@ def get_alerts():
             alerts.append(alert_data)
             
         return jsonify(alerts), 200
+    except InvalidQueryParameter:
+        raise
     except Exception as e:
         print(f"❌ Error fetching alerts: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/alerts', methods=['POST'])
+@idempotent
 def create_alert():
     """Creates a new alert (e.g., for SOS)."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -401,6 +1019,7 @@ def create_alert():
 @app.route('/alerts/<alert_id>', methods=['DELETE'])
 def delete_alert(alert_id):
     """Deletes an alert from the Firestore database."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -408,14 +1027,18 @@ def delete_alert(alert_id):
     return jsonify({"success": True}), 200
 
 @app.route('/feeding_records', methods=['GET'])
+@coalesce_reads
 def get_feeding_records():
-    """Fetches all feeding records from the Firestore database."""
+    """Fetches feeding records, optionally filtered by animalId, status and from/to dates."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
-    
+
+    fields = requested_fields('feeding_records')
     try:
         records_ref = db.collection('feeding_records')
-        docs = records_ref.order_by('recordedAt', direction=firestore.Query.DESCENDING).stream()
+        query = apply_filters(records_ref.order_by('recordedAt', direction=DESCENDING), 'feeding_records')
+        docs = project(query, fields).stream()
         
         records = []
         for doc in docs:
@@ -424,13 +1047,17 @@ def get_feeding_records():
             records.append(record_data)
             
         return jsonify(records), 200
+    except InvalidQueryParameter:
+        raise
     except Exception as e:
         print(f"❌ Error fetching feeding records: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/feeding_records', methods=['POST'])
+@idempotent
 def create_feeding_record():
     """Creates a new feeding record."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     
@@ -452,13 +1079,120 @@ def create_feeding_record():
 @app.route('/feeding_records/<record_id>', methods=['PUT'])
 def update_feeding_record(record_id):
     """Updates a feeding record (e.g., status)."""
+    db = get_db()
     if not db:
         return jsonify({"error": "Database not connected"}), 500
     data = request.get_json()
     db.collection('feeding_records').document(record_id).update(data)
     return jsonify({"success": True, "updated_data": data}), 200
 
+# --- Streaming Export ---
+# Large date-range exports for compliance reports. Documents are read from
+# Firestore a page at a time and written out row by row, so memory stays flat
+# no matter how many months are exported.
+EXPORT_PAGE_SIZE = 500
+
+def _paged_stream(query, page_size=EXPORT_PAGE_SIZE):
+    """Yields every document of `query`, fetching it in cursor-paginated pages."""
+    last_doc = None
+    while True:
+        page_query = query.limit(page_size)
+        if last_doc is not None:
+            page_query = page_query.start_after(last_doc)
+        count = 0
+        for doc in page_query.stream():
+            count += 1
+            last_doc = doc
+            yield doc
+        if count < page_size:
+            return
+
+def flatten_record(record, prefix=''):
+    """Flattens nested dicts into dotted keys; lists become JSON strings."""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, f"{name}."))
+        elif isinstance(value, (list, tuple)):
+            flat[name] = app.json.dumps(value)
+        else:
+            flat[name] = value
+    return flat
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+@app.route('/export/<collection>', methods=['GET'])
+def export_collection(collection):
+    """
+    Streams a collection as CSV (default) or NDJSON (?format=ndjson). Accepts the
+    same filters as the list endpoint (animalId, status, type, from, to) and
+    ?fields= to pick columns.
+    """
+    import csv
+    import io
+    from flask import Response, stream_with_context
+
+    if collection not in FILTERABLE_FIELDS:
+        return jsonify({"error": f"Export is not available for '{collection}'"}), 404
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        raise InvalidQueryParameter("'format' must be 'csv' or 'ndjson'")
+
+    db = get_db()
+    if not db:
+        return jsonify({"error": "Database not connected"}), 500
+
+    fields = requested_fields(collection)
+    date_field = FILTERABLE_FIELDS[collection]['date_field']
+    query = apply_filters(db.collection(collection).order_by(date_field, direction=DESCENDING), collection)
+    # Page cursors are built from the order-by field, so it must stay in the projection.
+    query = project(query, fields and sorted(set(fields) | {date_field}))
+
+    def records():
+        for doc in _paged_stream(query):
+            record = flatten_record(doc.to_dict())
+            record['id'] = doc.id
+            yield record
+
+    def generate_ndjson():
+        for record in records():
+            yield app.json.dumps(record) + '\n'
+
+    # CSV needs its header before the first row, so columns come from ?fields=
+    # or the collection's allow-list; flattened keys outside it are left out.
+    columns = ['id'] + (fields or sorted(PROJECTABLE_FIELDS[collection]))
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for record in records():
+            writer.writerow([_csv_value(record.get(column)) for column in columns])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+
+    date_range = '_'.join(filter(None, [request.args.get('from'), request.args.get('to')]))
+    filename = f"{collection}{'_' + date_range if date_range else ''}.{export_format}"
+    generator = generate_csv() if export_format == 'csv' else generate_ndjson()
+    return Response(
+        stream_with_context(generator),
+        mimetype='text/csv' if export_format == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
 @app.route('/upload_media', methods=['POST'])
+@idempotent
+@with_request_deadline
 def upload_media():
     """Uploads a media file to Cloudinary and returns its public URL."""
     if 'file' not in request.files:
@@ -470,10 +1204,7 @@ def upload_media():
 
     try:
         # Upload to Cloudinary, letting it auto-detect the resource type (image/video)
-        upload_result = cloudinary.uploader.upload(
-            file,
-            resource_type="auto"
-        )
+        upload_result = upload_to_cloudinary(file, resource_type="auto")
         # Return the secure URL provided by Cloudinary
         return jsonify({"url": upload_result['secure_url']}), 200
 
@@ -482,6 +1213,8 @@ def upload_media():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/process_text_observation', methods=['POST'])
+@idempotent
+@with_request_deadline
 def process_text_observation():
     """
     Processes a multipart form submission containing log data and media files.
@@ -507,7 +1240,7 @@ def process_text_observation():
         file = request.files['gateImage']
         if file.filename:
             try:
-                upload_result = cloudinary.uploader.upload(file, resource_type="auto")
+                upload_result = upload_to_cloudinary(file, resource_type="auto")
                 data['gateImageUrl'] = upload_result['secure_url']
                 print(f"✅ Successfully uploaded gateImage to Cloudinary.")
             except Exception as e:
@@ -517,7 +1250,7 @@ def process_text_observation():
         file = request.files['animalImage']
         if file.filename:
             try:
-                upload_result = cloudinary.uploader.upload(file, resource_type="auto")
+                upload_result = upload_to_cloudinary(file, resource_type="auto")
                 data['imageUrl'] = upload_result['secure_url']  # LogHistory expects 'imageUrl'
                 print(f"✅ Successfully uploaded animalImage to Cloudinary.")
             except Exception as e:
@@ -527,27 +1260,24 @@ def process_text_observation():
         file = request.files['animalVideo']
         if file.filename:
             try:
-                upload_result = cloudinary.uploader.upload(file, resource_type="video")
+                upload_result = upload_to_cloudinary(file, resource_type="video")
                 data['videoUrl'] = upload_result['secure_url']  # LogHistory expects 'videoUrl'
                 print(f"✅ Successfully uploaded animalVideo to Cloudinary.")
             except Exception as e:
                 print(f"⚠️ Cloudinary upload failed for animalVideo: {e}")
 
     # --- AI Processing ---
-    animal_name = "Unknown"
-    if db and animal_id:
-        try:
-            animal_doc = db.collection('animals').document(animal_id).get()
-            if animal_doc.exists:
-                animal_name = animal_doc.to_dict().get('name', 'Unknown')
-        except Exception as e:
-            print(f"⚠️ Could not fetch animal name for ID {animal_id}: {e}")
+    db = get_db()
+    animal_name = get_animal_name(animal_id)
 
     try:
         # Store the original observation text before AI processing
         original_observation_text = observation_text
         
-        ai_summary = zoo_model.process_observation(observation_text, data['createdAt'], animal_name)
+        ai_summary = get_ai_model().process_observation(
+            observation_text, data['createdAt'], animal_name,
+            priority=observation_priority(observation_text, data.get('healthStatus')),
+        )
         
         # Merge AI summary fields directly into data (not nested)
         ai_data = ai_summary.model_dump()
@@ -569,15 +1299,15 @@ def process_text_observation():
                     'createdAt': datetime.utcnow().isoformat(),
                     'createdBy': 'System (Auto-generated)'
                 }
-                db.collection('alerts').add(alert_payload)
+                insert_document('alerts', alert_payload)
                 print(f"✅ Auto-generated health alert for {animal_name}.")
             except Exception as alert_e:
                 print(f"⚠️ Failed to auto-generate health alert: {alert_e}")
 
         # Save to Firestore if the client is available
         if db:
-            doc_ref_tuple = db.collection('observations').add(data)
-            print(f"✅ Data saved to Firestore with ID: {doc_ref_tuple[1].id}")
+            doc_id = insert_document('observations', data)
+            print(f"✅ Data saved to Firestore with ID: {doc_id}")
 
         return jsonify(data), 200
     except Exception as e:
@@ -585,6 +1315,8 @@ def process_text_observation():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/transcribe_audio', methods=['POST'])
+@idempotent
+@with_request_deadline
 def transcribe_audio():
     """Transcribes an audio file and returns the text."""
     if 'audio' not in request.files:
@@ -596,7 +1328,7 @@ def transcribe_audio():
 
     try:
         # Use the AI model's transcription method
-        transcript = zoo_model.transcribe_audio(audio_bytes, content_type)
+        transcript = get_ai_model().transcribe_audio(audio_bytes, content_type)
         if transcript.startswith("Error") or transcript.startswith("Audio transcription unavailable"):
             return jsonify({"error": transcript}), 500
 
@@ -606,6 +1338,8 @@ def transcribe_audio():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/process_audio_observation', methods=['POST'])
+@idempotent
+@with_request_deadline
 def process_audio_observation():
     """Processes an audio observation, transcribes it, and stores it in Firestore."""
     if 'audio' not in request.files:
@@ -621,33 +1355,28 @@ def process_audio_observation():
         return jsonify({"error": "Missing 'date' in request form data"}), 400
 
     audio_bytes = audio_file.read()
-    zoo_model.prefix = prefix # Set prefix on the model instance
-
-    animal_name = "Unknown"
-    if db and animal_id:
-        try:
-            animal_doc = db.collection('animals').document(animal_id).get()
-            if animal_doc.exists:
-                animal_name = animal_doc.to_dict().get('name', 'Unknown')
-        except Exception as e:
-            print(f"⚠️ Could not fetch animal name for ID {animal_id}: {e}")
+    db = get_db()
+    animal_name = get_animal_name(animal_id)
 
     try:
         # Use the AI model to transcribe and process the audio
-        structured_data: AnimalMonitoringData = zoo_model.process_audio_observation(audio_bytes, date, content_type, animal_name)
+        structured_data: AnimalMonitoringData = get_ai_model().process_audio_observation(
+            audio_bytes, date, content_type, animal_name, prefix=prefix
+        )
         data_dict = structured_data.model_dump()
 
         # Save to Firestore if the client is available
         if db:
-            doc_ref_tuple = db.collection('observations').add(data_dict)
-            doc_ref = doc_ref_tuple[1]
-            print(f"✅ Data saved to Firestore with ID: {doc_ref.id}")
+            doc_id = insert_document('observations', data_dict)
+            print(f"✅ Data saved to Firestore with ID: {doc_id}")
 
         return jsonify(data_dict), 200
     except Exception as e:
         print(f"❌ Error processing audio observation: {e}")
         return jsonify({"error": str(e)}), 500
 
+startup_timings["module_import"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+
 if __name__ == '__main__':
     # --- API Key Configuration ---
     # IMPORTANT: Set your API keys as environment variables for security.
@@ -661,11 +1390,13 @@ if __name__ == '__main__':
     if not os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
         print("⚠️ WARNING: GOOGLE_APPLICATION_CREDENTIALS environment variable not set. Firestore connection will fail. Ensure it's in your .env file or set in your environment.")
 
-    # The zoo_model is instantiated globally, so its __init__ will run when backend_api.py is imported.
-    # The __init__ method now directly reads from os.environ.
+    # The zoo_model is built lazily; fetch it here so the key checks below can run.
+    # The __init__ method directly reads from os.environ.
+    zoo_model = get_ai_model()
     if not zoo_model.deepgram_key:
         print("⚠️ WARNING: DEEPGRAM_API_KEY not found. Audio transcription will fail. Ensure it's in your .env file or set in your environment.")
     if not zoo_model.llm: # Check if LLM was initialized successfully
         print("⚠️ WARNING: GEMINI_API_KEY not found. AI processing will use fallback data. Ensure it's in your .env file or set in your environment.")
 
+    start_background_warmup()
     app.run(debug=True, port=5000)
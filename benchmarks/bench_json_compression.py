@@ -0,0 +1,100 @@
+"""
+Benchmark: stock Flask JSON vs the orjson provider, and the bytes saved by
+gzip/brotli, on payloads shaped like real /observations responses.
+
+Run from the repository root:
+    python benchmarks/bench_json_compression.py [--docs 500] [--repeat 20]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from response_layer import FastJSONProvider, compress_body, brotli
+
+NOTES = [
+    "Simba was active in the morning, ate 6 kg of meat and drank water normally.",
+    "शेर ने सुबह खाना खाया, पानी पिया और बाड़े में सामान्य रूप से घूमता रहा।",
+    "Slight limp on the left hind leg noticed during the afternoon round; vet informed.",
+    "Enclosure cleaned, water trough refilled, enrichment log placed near the pond.",
+]
+
+
+def make_observation(i, started):
+    note = random.choice(NOTES)
+    created = started - timedelta(minutes=17 * i)
+    return {
+        "id": f"obs{i:05d}",
+        "animalId": f"A{random.randint(1, 40):03d}",
+        "animalName": random.choice(["Simba", "Raja", "Ganga", "Sheru", "Moti"]),
+        "createdAt": created,
+        "observationText": note * 2,
+        "healthStatus": random.choice(["excellent", "good", "fair", "poor"]),
+        "imageUrl": f"https://res.cloudinary.com/demo/image/upload/v1700000000/obs{i:05d}.jpg",
+        "date_or_day": created.date().isoformat(),
+        "animal_observed_on_time": True,
+        "clean_drinking_water_provided": True,
+        "enclosure_cleaned_properly": random.random() > 0.1,
+        "normal_behaviour_status": random.random() > 0.2,
+        "normal_behaviour_details": None,
+        "feed_and_supplements_available": True,
+        "feed_given_as_prescribed": True,
+        "other_animal_requirements": note,
+        "incharge_signature": "Zoo Keeper",
+        "daily_animal_health_monitoring": f"Observation recorded on {created.date()}: {note} " * 3,
+        "carnivorous_animal_feeding_chart": "Standard feeding schedule followed; 6 kg buffalo meat with calcium supplement.",
+        "medicine_stock_register": "Stock levels adequate",
+        "daily_wildlife_monitoring": f"Wildlife monitoring completed on {created.date()}",
+    }
+
+
+def cpu_time(fn, repeat):
+    began = time.process_time()
+    for _ in range(repeat):
+        result = fn()
+    return (time.process_time() - began) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(7)
+    started = datetime.now(timezone.utc)
+    payload = [make_observation(i, started) for i in range(args.docs)]
+    app = Flask(__name__)
+
+    stock = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    with app.app_context():
+        stock_time, stock_body = cpu_time(lambda: stock.response(payload).get_data(), args.repeat)
+        fast_time, fast_body = cpu_time(lambda: fast.response(payload).get_data(), args.repeat)
+
+    print(f"Payload: {args.docs} observation documents")
+    print(f"{'encoder':<22}{'CPU ms':>10}{'bytes':>12}")
+    print(f"{'flask stock json':<22}{stock_time * 1000:>10.2f}{len(stock_body):>12,}")
+    print(f"{'orjson provider':<22}{fast_time * 1000:>10.2f}{len(fast_body):>12,}")
+    print(f"Encoder speed-up: {stock_time / fast_time:.1f}x")
+    print()
+
+    print(f"{'compression':<22}{'CPU ms':>10}{'bytes':>12}{'saved':>10}")
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for encoding in encodings:
+        compress_time, compressed = cpu_time(lambda: compress_body(fast_body, encoding), args.repeat)
+        saved = 1 - len(compressed) / len(fast_body)
+        print(f"{encoding:<22}{compress_time * 1000:>10.2f}{len(compressed):>12,}{saved:>10.1%}")
+    if brotli is None:
+        print("(brotli not installed; skipped)")
+
+
+if __name__ == "__main__":
+    main()
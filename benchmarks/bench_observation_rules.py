@@ -0,0 +1,96 @@
+"""
+Benchmark: the rule-based fast path (observation_rules) against labelled
+keeper notes and, when GEMINI_API_KEY is set, against Gemini itself.
+
+For each note the rules either answer (confidence >= threshold) or defer to
+Gemini. Reports how many notes take the fast path, how accurate the boolean
+fields are on that path, and the latency of each path.
+
+Run from the repository root:
+    python benchmarks/bench_observation_rules.py [--threshold 0.8] [--llm]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from observation_rules import BOOLEAN_FIELDS, extract_observation
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "labelled_observations.json")
+
+
+def field_accuracy(predicted, labels):
+    return sum(predicted[field] == labels[field] for field in BOOLEAN_FIELDS) / len(BOOLEAN_FIELDS)
+
+
+def run_llm(notes):
+    """Gemini's answer and latency for every note, with the fast path disabled."""
+    os.environ["OBSERVATION_RULES_THRESHOLD"] = "2"
+    from zoo_model_1762023720806 import get_zoo_model
+
+    model = get_zoo_model()
+    results = []
+    for note in notes:
+        started = time.perf_counter()
+        data = model.process_observation(note["text"], "2024-01-15")
+        results.append(({field: getattr(data, field) for field in BOOLEAN_FIELDS}, time.perf_counter() - started))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--llm", action="store_true", help="also call Gemini (needs GEMINI_API_KEY)")
+    parser.add_argument("--repeat", type=int, default=200, help="rule timing repetitions")
+    args = parser.parse_args()
+
+    with open(SAMPLE, encoding="utf-8") as f:
+        notes = json.load(f)
+
+    fast, deferred, rule_seconds = [], [], []
+    for note in notes:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            extraction = extract_observation(note["text"])
+        rule_seconds.append((time.perf_counter() - started) / args.repeat)
+        if extraction.complete and extraction.confidence >= args.threshold:
+            fast.append((note, field_accuracy(extraction.as_fields(), note["labels"])))
+        else:
+            deferred.append(note)
+
+    print(f"{len(notes)} labelled notes, threshold {args.threshold}")
+    print(f"fast path: {len(fast)} notes ({len(fast) / len(notes):.0%}), "
+          f"field accuracy {statistics.mean(a for _, a in fast):.1%}" if fast else "fast path: 0 notes")
+    print(f"rules latency: median {statistics.median(rule_seconds) * 1e3:.3f} ms, "
+          f"max {max(rule_seconds) * 1e3:.3f} ms")
+    for note, accuracy in fast:
+        if accuracy < 1:
+            print(f"  wrong field(s) on fast path ({accuracy:.0%}): {note['text']}")
+    print(f"deferred to Gemini: {len(deferred)} notes")
+
+    if not args.llm:
+        return
+    if not os.environ.get("GEMINI_API_KEY"):
+        sys.exit("--llm needs GEMINI_API_KEY")
+
+    llm = run_llm(notes)
+    llm_accuracy = [field_accuracy(predicted, note["labels"]) for (predicted, _), note in zip(llm, notes)]
+    llm_seconds = [elapsed for _, elapsed in llm]
+    fast_accuracy = {note["text"]: accuracy for note, accuracy in fast}
+    hybrid = [fast_accuracy.get(note["text"], llm_accuracy[i]) for i, note in enumerate(notes)]
+    agreement = statistics.mean(
+        field_accuracy(extract_observation(note["text"]).as_fields(), predicted)
+        for note, (predicted, _) in zip(notes, llm) if note["text"] in fast_accuracy
+    ) if fast else 0.0
+    print(f"gemini: field accuracy {statistics.mean(llm_accuracy):.1%}, "
+          f"median latency {statistics.median(llm_seconds):.2f}s")
+    print(f"rules agree with gemini on {agreement:.1%} of fast-path fields")
+    print(f"hybrid (rules + gemini): field accuracy {statistics.mean(hybrid):.1%}")
+
+
+if __name__ == "__main__":
+    main()
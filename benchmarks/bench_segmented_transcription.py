@@ -0,0 +1,64 @@
+"""
+Benchmark: one Deepgram request per recording vs parallel segmented
+transcription, against the local FakeDeepgram service.
+
+Checks that the stitched transcript has every word in order and that only the
+first segment asks Deepgram to detect the language.
+
+Run from the repository root:
+    python benchmarks/bench_segmented_transcription.py [--seconds 240] [--parallel 4]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("DEEPGRAM_API_KEY", "benchmark")
+
+import audio_segments
+import zoo_model_1762023720806 as zoo
+from fake_services import FakeDeepgram, expected_transcript, speech_like_wav
+
+
+def run(model, audio, segment_seconds):
+    audio_segments.SEGMENT_SECONDS = segment_seconds
+    model.transcript_cache = zoo.TranscriptCache()
+    started = time.perf_counter()
+    transcript = model.transcribe_audio(audio, "audio/wav")
+    return transcript, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=240)
+    parser.add_argument("--segment", type=float, default=30)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--realtime-factor", type=float, default=0.05,
+                        help="fake service seconds of processing per second of audio")
+    args = parser.parse_args()
+
+    zoo.TRANSCRIBE_MAX_PARALLEL = args.parallel
+    audio, words = speech_like_wav(args.seconds)
+    expected = expected_transcript(words)
+    print(f"{args.seconds:.0f}s recording, {words} words, {len(audio) / 1e6:.1f} MB WAV")
+
+    with FakeDeepgram(args.base_latency, args.realtime_factor) as deepgram:
+        model = zoo.get_zoo_model()
+        model.deepgram_url = deepgram.url
+        for label, segment_seconds in [("single request", 0), ("segmented", args.segment)]:
+            deepgram.requests.clear()
+            transcript, elapsed = run(model, audio, segment_seconds)
+            detecting = sum(1 for params in deepgram.requests if params.get("detect_language") == "true")
+            status = "ok" if transcript == expected else "TRANSCRIPT MISMATCH"
+            print(f"{label:22s} {elapsed:6.2f}s  {len(deepgram.requests):2d} requests, "
+                  f"{detecting} with language detection  [{status}]")
+            if transcript != expected:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+Local stand-ins for external services, for benchmarks.
+
+FakeDeepgram serves /v1/listen on localhost. It "transcribes" 16-bit PCM WAV
+made by speech_like_wav(): every tone burst in the audio is one word, and the
+burst's amplitude encodes the word's index, so a stitched transcript can be
+checked for order. Latency is `base_latency + realtime_factor * audio seconds`,
+like a real speech-to-text service.
+
+FakeGemini serves generateContent and answers with an AnimalMonitoringData
+JSON object built from the observation in the prompt.
+
+FakeFirestore and FakeUploader are in-process replacements for the Firestore
+client and cloudinary.uploader, with a fixed latency per call; load_server.py
+installs them into backend_api.
+
+Run this file to serve FakeDeepgram and FakeGemini until interrupted:
+    python benchmarks/fake_services.py [--gemini-latency 0.6]
+"""
+import io
+import re
+import sys
+import json
+import time
+import wave
+import random
+import string
+import argparse
+import threading
+from array import array
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SAMPLE_RATE = 16000
+WORD_SECONDS = 0.4
+GAP_SECONDS = 0.25
+BASE_AMPLITUDE = 2000
+AMPLITUDE_STEP = 10
+
+
+def speech_like_wav(seconds, sample_rate=SAMPLE_RATE):
+    """Mono 16-bit WAV of tone bursts ("words") separated by silence; returns (bytes, word count)."""
+    samples = array("h")
+    word = 0
+    while len(samples) < seconds * sample_rate:
+        amplitude = BASE_AMPLITUDE + AMPLITUDE_STEP * word
+        burst = int(WORD_SECONDS * sample_rate)
+        # A square wave keeps each burst's peak exactly at `amplitude`.
+        samples.extend(amplitude if (i // 20) % 2 else -amplitude for i in range(burst))
+        samples.extend([0] * int(GAP_SECONDS * sample_rate))
+        word += 1
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(samples.tobytes())
+    return buffer.getvalue(), word
+
+
+def expected_transcript(words):
+    return " ".join(f"w{i}" for i in range(words))
+
+
+def _words_in(audio_bytes):
+    with wave.open(io.BytesIO(audio_bytes)) as reader:
+        rate = reader.getframerate()
+        samples = array("h", reader.readframes(reader.getnframes()))
+    window = int(rate * 0.02)
+    words, in_word = [], False
+    for start in range(0, len(samples), window):
+        peak = max(samples[start:start + window], default=0)
+        if peak > BASE_AMPLITUDE // 2 and not in_word:
+            words.append(f"w{round((peak - BASE_AMPLITUDE) / AMPLITUDE_STEP)}")
+        in_word = peak > BASE_AMPLITUDE // 2
+    return words, len(samples) / rate
+
+
+class _FakeHTTPService:
+    """Threaded localhost HTTP server; subclasses implement answer(path, params, body) -> dict."""
+
+    path = "/"
+
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}{self.path}"
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real services
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with service._lock:
+                    service.requests.append(params)
+                payload = json.dumps(service.answer(params, body)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def answer(self, params, body):
+        raise NotImplementedError
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeDeepgram(_FakeHTTPService):
+    """Imitates Deepgram's /v1/listen endpoint."""
+
+    path = "/v1/listen"
+
+    def __init__(self, base_latency=0.3, realtime_factor=0.05, detected_language="hi"):
+        self.base_latency = base_latency
+        self.realtime_factor = realtime_factor
+        self.detected_language = detected_language
+        super().__init__()
+
+    def answer(self, params, body):
+        words, seconds = _words_in(body)
+        time.sleep(self.base_latency + self.realtime_factor * seconds)
+        channel = {"alternatives": [{"transcript": " ".join(words)}]}
+        if params.get("detect_language") == "true":
+            channel["detected_language"] = self.detected_language
+        return {"results": {"channels": [channel]}}
+
+
+_OBSERVATION = re.compile(r"Date: (.*?)\nObservation: (.*)", re.S)
+
+
+class FakeGemini(_FakeHTTPService):
+    """Imitates Gemini's generateContent endpoint with a fixed (jittered) latency."""
+
+    path = "/v1beta/models/gemini-2.5-flash-lite:generateContent"
+
+    def __init__(self, latency=0.6, jitter=0.2):
+        self.latency = latency
+        self.jitter = jitter
+        super().__init__()
+
+    def answer(self, params, body):
+        prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+        match = _OBSERVATION.search(prompt.strip())
+        date, observation = match.groups() if match else ("", prompt[-200:])
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter * self.latency)))
+        lowered = observation.lower()
+        reply = {
+            "date_or_day": date,
+            "animal_observed_on_time": "not seen" not in lowered,
+            "clean_drinking_water_provided": "no water" not in lowered and "empty" not in lowered,
+            "enclosure_cleaned_properly": "not cleaned" not in lowered,
+            "normal_behaviour_status": not any(w in lowered for w in ("letharg", "limp", "injur", "sos")),
+            "normal_behaviour_details": None,
+            "feed_and_supplements_available": True,
+            "feed_given_as_prescribed": "did not eat" not in lowered,
+            "other_animal_requirements": observation,
+            "incharge_signature": "Zoo Keeper",
+            "daily_animal_health_monitoring": f"Observation recorded on {date}: {observation}",
+            "carnivorous_animal_feeding_chart": "Standard feeding schedule followed",
+            "medicine_stock_register": "Stock levels adequate",
+            "daily_wildlife_monitoring": f"Wildlife monitoring completed on {date}",
+        }
+        text = json.dumps(reply, ensure_ascii=False)
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4},
+        }
+
+
+# ----------------------------
+# In-process Firestore and Cloudinary
+# ----------------------------
+def _auto_id():
+    return "".join(random.choice(string.ascii_letters + string.digits) for _ in range(20))
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, store, collection, doc_id):
+        self._store = store
+        self.collection_name = collection
+        self.id = doc_id
+
+    def get(self, transaction=None):
+        self._store.pause(self._store.read_latency)
+        with self._store.lock:
+            data = self._store.docs(self.collection_name).get(self.id)
+            return FakeSnapshot(self, dict(data) if data is not None else None)
+
+    def set(self, data):
+        self._store.pause(self._store.write_latency)
+        self._store.write(self.collection_name, self.id, dict(data))
+
+    def update(self, data):
+        self._store.pause(self._store.write_latency)
+        with self._store.lock:
+            docs = self._store.docs(self.collection_name)
+            if self.id not in docs:
+                raise KeyError(f"No document to update: {self.collection_name}/{self.id}")
+            docs[self.id].update(data)
+
+    def delete(self):
+        self._store.pause(self._store.write_latency)
+        with self._store.lock:
+            self._store.docs(self.collection_name).pop(self.id, None)
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+}
+
+
+class FakeQuery:
+    def __init__(self, store, collection, filters=(), order=None, limit_to=None, fields=None, after=None):
+        self._store = store
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._order = order
+        self._limit = limit_to
+        self._fields = fields
+        self._after = after
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, order=self._order, limit_to=self._limit,
+                     fields=self._fields, after=self._after)
+        state.update(changes)
+        return FakeQuery(self._store, self._collection, **state)
+
+    def where(self, field=None, op=None, value=None, filter=None):
+        if filter is not None:
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(order=(field, direction == "DESCENDING"))
+
+    def limit(self, count):
+        return self._copy(limit_to=count)
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot.id)
+
+    def stream(self):
+        self._store.pause(self._store.read_latency)
+        with self._store.lock:
+            items = [(doc_id, dict(data)) for doc_id, data in self._store.docs(self._collection).items()]
+        for field, op, value in self._filters:
+            items = [(i, d) for i, d in items if _OPERATORS[op](d.get(field), value)]
+        if self._order:
+            field, descending = self._order
+            items = [(i, d) for i, d in items if d.get(field) is not None]
+            items.sort(key=lambda item: item[1][field], reverse=descending)
+        if self._after is not None:
+            ids = [doc_id for doc_id, _ in items]
+            items = items[ids.index(self._after) + 1:] if self._after in ids else []
+        if self._limit is not None:
+            items = items[:self._limit]
+        for doc_id, data in items:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            yield FakeSnapshot(FakeDocument(self._store, self._collection, doc_id), data)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, store, name):
+        super().__init__(store, name)
+        self.name = name
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._store, self.name, doc_id or _auto_id())
+
+    def add(self, data):
+        document = self.document()
+        document.set(data)
+        return datetime.utcnow(), document
+
+
+class FakeBatch:
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+
+    def set(self, document, data):
+        self._writes.append((document, dict(data)))
+
+    def commit(self):
+        self._store.pause(self._store.write_latency)
+        for document, data in self._writes:
+            self._store.write(document.collection_name, document.id, data)
+
+
+class FakeTransaction:
+    """
+    Enough of firestore.Transaction for the @firestore.transactional decorator:
+    transactions on one store run one at a time (the server SDK also locks
+    pessimistically) and their updates apply on commit.
+    """
+
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, store):
+        self._store = store
+        self._id = None
+        self._updates = []
+
+    def _begin(self, retry_id=None):
+        self._store.transaction_lock.acquire()
+        self._id = _auto_id().encode()
+
+    def _clean_up(self):
+        self._updates = []
+        if self._id is not None:
+            self._id = None
+            self._store.transaction_lock.release()
+
+    def _commit(self):
+        for document, data in self._updates:
+            document.update(data)
+        self._clean_up()
+        return []
+
+    def _rollback(self):
+        self._clean_up()
+
+    def update(self, document, data):
+        self._updates.append((document, dict(data)))
+
+
+class FakeFirestore:
+    """Thread-safe in-memory Firestore client covering the calls backend_api makes."""
+
+    def __init__(self, read_latency=0.02, write_latency=0.03):
+        self.read_latency = read_latency
+        self.write_latency = write_latency
+        self.lock = threading.Lock()
+        self.transaction_lock = threading.Lock()
+        self._collections = {}
+
+    @staticmethod
+    def pause(seconds):
+        if seconds:
+            time.sleep(seconds)
+
+    def docs(self, collection):
+        return self._collections.setdefault(collection, {})
+
+    def write(self, collection, doc_id, data):
+        with self.lock:
+            self.docs(collection)[doc_id] = data
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+
+class FakeUploader:
+    """Stands in for cloudinary.uploader: upload() reads the file and returns a URL."""
+
+    def __init__(self, latency=0.25):
+        self.latency = latency
+
+    def upload(self, file, resource_type="auto", timeout=None, return_error=False):
+        size = len(file.read())
+        time.sleep(self.latency)
+        return {"secure_url": f"https://res.cloudinary.com/fake/{resource_type}/upload/{_auto_id()}", "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve FakeDeepgram and FakeGemini until interrupted.")
+    parser.add_argument("--gemini-latency", type=float, default=0.6)
+    parser.add_argument("--deepgram-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with FakeDeepgram(base_latency=args.deepgram_latency) as deepgram, FakeGemini(args.gemini_latency) as gemini:
+        # load_test.py reads these two lines to find the services.
+        print(f"DEEPGRAM_API_URL={deepgram.url}", flush=True)
+        print(f"GEMINI_API_URL={gemini.url}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
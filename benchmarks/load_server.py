@@ -0,0 +1,78 @@
+"""
+backend_api:app with in-process fakes for Firestore and Cloudinary, for load
+tests. Gemini and Deepgram are reached over HTTP at GEMINI_API_URL and
+DEEPGRAM_API_URL (see fake_services.py). Started by load_test.py as
+    gunicorn -c gunicorn.conf.py --pythonpath benchmarks load_server:app
+
+Fake latencies (seconds) come from LOADTEST_FIRESTORE_READ_LATENCY,
+LOADTEST_FIRESTORE_WRITE_LATENCY and LOADTEST_CLOUDINARY_LATENCY.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backend_api
+from fake_services import FakeFirestore, FakeUploader
+
+SEED_ANIMALS = 40
+SEED_OBSERVATIONS = 400
+SEED_MEDICATIONS = 60
+SEED_ALERTS = 50
+SEED_INVENTORY = 80
+
+
+def seed(store):
+    """A zoo's worth of documents, with ids the load test can address (A001, MED001...)."""
+    now = datetime.utcnow()
+    for n in range(1, SEED_ANIMALS + 1):
+        animal_id = f"A{n:03d}"
+        store.write("animals", animal_id, {
+            "id": animal_id, "number": f"{n:03d}", "name": f"Animal {n}", "species": "Panthera leo",
+            "enclosure": f"E{n % 10}", "health": "good",
+        })
+    for n in range(SEED_OBSERVATIONS):
+        created = (now - timedelta(hours=n)).isoformat()
+        store.write("observations", f"OBS{n:04d}", {
+            "animalId": f"A{n % SEED_ANIMALS + 1:03d}", "animalName": f"Animal {n % SEED_ANIMALS + 1}",
+            "createdAt": created, "healthStatus": "good", "date_or_day": created[:10],
+            "observationText": "Fed, water changed, enclosure cleaned, animal normal.",
+            "daily_animal_health_monitoring": "Observation recorded: routine round, no issues.",
+        })
+    for n in range(1, SEED_MEDICATIONS + 1):
+        store.write("medications", f"MED{n:03d}", {
+            "animalId": f"A{n % SEED_ANIMALS + 1:03d}", "medicationName": "Ivermectin", "dosage": "5 ml",
+            "frequency": "daily", "status": "active", "startDate": (now - timedelta(days=n)).date().isoformat(),
+            "administrationLog": [], "createdAt": (now - timedelta(days=n)).isoformat(),
+        })
+    for n in range(SEED_ALERTS):
+        store.write("alerts", f"ALERT{n:03d}", {
+            "type": "health", "message": "Routine check overdue", "status": "active" if n % 3 else "resolved",
+            "createdAt": (now - timedelta(hours=3 * n)).isoformat(), "createdBy": "System (Auto-generated)",
+        })
+    for n in range(SEED_INVENTORY):
+        item = {
+            "name": f"Item {n}", "category": "feed", "quantity": n % 25, "unit": "kg", "minThreshold": 10,
+            "expiryDate": (now + timedelta(days=n)).date().isoformat(),
+        }
+        item.update(backend_api.compute_inventory_index(item))
+        store.write("inventory", f"INV{n:03d}", item)
+
+
+def _fake_firestore():
+    store = FakeFirestore(
+        read_latency=float(os.environ.get("LOADTEST_FIRESTORE_READ_LATENCY", "0.02")),
+        write_latency=float(os.environ.get("LOADTEST_FIRESTORE_WRITE_LATENCY", "0.03")),
+    )
+    seed(store)
+    return store
+
+
+backend_api._firestore_client.factory = _fake_firestore
+backend_api._cloudinary_uploader.factory = lambda: FakeUploader(
+    float(os.environ.get("LOADTEST_CLOUDINARY_LATENCY", "0.25"))
+)
+
+app = backend_api.app
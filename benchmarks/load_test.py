@@ -0,0 +1,311 @@
+"""
+Load test: replay a zoo's traffic mix against backend_api:app under gunicorn,
+with fake Gemini, Deepgram, Firestore and Cloudinary, at increasing
+concurrency.
+
+The mix, the spikes (SOS alerts, morning-round observation bursts), the
+server settings and the pass/fail thresholds live in load_test_config.json.
+For every concurrency level the report shows throughput, latency percentiles
+and the error rate, overall and per scenario. The exit status is 1 when a
+threshold is missed.
+
+Run from the repository root:
+    python benchmarks/load_test.py [--levels 1,8,32] [--duration 20] [--workers 2]
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_services import speech_like_wav
+
+CONFIG = os.path.join(BENCH_DIR, "load_test_config.json")
+NOTES = os.path.join(BENCH_DIR, "labelled_observations.json")
+ANIMALS = [f"A{n:03d}" for n in range(1, 41)]
+MEDICATIONS = [f"MED{n:03d}" for n in range(1, 61)]
+INVENTORY = [f"INV{n:03d}" for n in range(80)]
+
+
+# ----------------------------
+# Scenarios
+# ----------------------------
+class Workload:
+    """Request builders for each scenario; each returns an httpx response."""
+
+    def __init__(self):
+        with open(NOTES, encoding="utf-8") as f:
+            self.notes = [note["text"] for note in json.load(f)]
+        self.photo = os.urandom(80 * 1024)  # A phone photo after client-side compression
+        self.voice_note, _ = speech_like_wav(8)
+
+    async def observation_text(self, client):
+        log = {
+            "observationText": random.choice(self.notes),
+            "animalId": random.choice(ANIMALS),
+            "createdAt": datetime.utcnow().isoformat(),
+            "healthStatus": "poor" if random.random() < 0.05 else random.choice(["excellent", "good", "fair"]),
+            "submittedBy": "keeper",
+        }
+        return await client.post(
+            "/process_text_observation",
+            data={"logData": json.dumps(log)},
+            files={"animalImage": ("photo.jpg", self.photo, "image/jpeg")},
+        )
+
+    async def observation_audio(self, client):
+        return await client.post(
+            "/process_audio_observation",
+            data={"date": datetime.utcnow().date().isoformat(), "animalId": random.choice(ANIMALS)},
+            files={"audio": ("note.wav", self.voice_note, "audio/wav")},
+        )
+
+    async def dashboard(self, client):
+        path = random.choice([
+            f"/observations?fields=animalName,createdAt,healthStatus&animalId={random.choice(ANIMALS)}",
+            "/observations?fields=animalName,createdAt,healthStatus",
+            "/alerts?status=active",
+            "/inventory/alerts",
+            "/medications?status=active",
+            "/animals?fields=id,name,health",
+        ])
+        return await client.get(path, headers={"Accept-Encoding": "gzip"})
+
+    async def medication_update(self, client):
+        return await client.put(f"/medications/{random.choice(MEDICATIONS)}", json={
+            "status": random.choice(["active", "active", "completed"]),
+            "administrationLog": [{"at": datetime.utcnow().isoformat(), "by": "vet"}],
+        })
+
+    async def inventory_update(self, client):
+        return await client.put(f"/inventory/{random.choice(INVENTORY)}", json={
+            "quantity": random.randint(0, 30),
+        })
+
+    async def medication_create(self, client):
+        return await client.post("/medications", json={
+            "animalId": random.choice(ANIMALS), "medicationName": "Meloxicam", "dosage": "2 ml",
+            "frequency": "daily", "status": "active", "startDate": datetime.utcnow().date().isoformat(),
+        })
+
+    async def sos(self, client):
+        return await client.post("/alerts", json={
+            "type": "sos", "message": f"SOS near enclosure E{random.randint(0, 9)}",
+            "animalName": f"Animal {random.randint(1, 40)}", "location": "Zone B",
+        })
+
+
+async def _timed(workload, scenario, client, results):
+    started = time.perf_counter()
+    try:
+        response = await getattr(workload, scenario)(client)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    results.append((scenario, time.perf_counter() - started, ok))
+
+
+async def _user(workload, client, mix, deadline, results):
+    scenarios, weights = zip(*mix.items())
+    while time.perf_counter() < deadline:
+        await _timed(workload, random.choices(scenarios, weights)[0], client, results)
+
+
+async def _spikes(workload, client, spike, deadline, results):
+    """Fire `burst` concurrent requests of one scenario every `every_seconds`."""
+    pending = []
+    while True:
+        next_burst = time.perf_counter() + spike["every_seconds"]
+        if next_burst >= deadline:
+            break
+        await asyncio.sleep(next_burst - time.perf_counter())
+        pending += [asyncio.ensure_future(_timed(workload, spike["scenario"], client, results))
+                    for _ in range(spike["burst"])]
+    await asyncio.gather(*pending)
+
+
+async def run_level(base_url, workload, config, concurrency, duration):
+    results = []
+    burst = sum(spike["burst"] for spike in config["spikes"])
+    limits = httpx.Limits(max_connections=concurrency + burst, max_keepalive_connections=concurrency + burst)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(
+            *(_user(workload, client, config["mix"], deadline, results) for _ in range(concurrency)),
+            *(_spikes(workload, client, spike, deadline, results) for spike in config["spikes"]),
+        )
+        elapsed = time.perf_counter() - started
+    return summarize(results, elapsed)
+
+
+# ----------------------------
+# Reporting
+# ----------------------------
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def _stats(samples, elapsed):
+    latencies = sorted(latency for _, latency, _ in samples)
+    errors = sum(1 for _, _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000),
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+    }
+
+
+def summarize(results, elapsed):
+    summary = _stats(results, elapsed)
+    summary["scenarios"] = {
+        scenario: _stats([r for r in results if r[0] == scenario], elapsed)
+        for scenario in sorted({r[0] for r in results})
+    }
+    return summary
+
+
+def print_level(concurrency, summary):
+    print(f"\nconcurrency {concurrency}: {summary['requests']} requests, {summary['rps']} req/s, "
+          f"p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms, "
+          f"errors {summary['error_rate']:.2%}")
+    print(f"  {'scenario':20s} {'requests':>8s} {'req/s':>7s} {'p50':>7s} {'p95':>7s} {'p99':>7s} {'errors':>7s}")
+    for scenario, stats in summary["scenarios"].items():
+        print(f"  {scenario:20s} {stats['requests']:8d} {stats['rps']:7.1f} {stats['p50_ms']:7d} "
+              f"{stats['p95_ms']:7d} {stats['p99_ms']:7d} {stats['error_rate']:7.2%}")
+
+
+def check_thresholds(results, thresholds):
+    """List of human-readable threshold misses (empty when everything passed)."""
+    failures = []
+    for concurrency, summary in results.items():
+        if summary["error_rate"] > thresholds["max_error_rate"]:
+            failures.append(f"c={concurrency}: error rate {summary['error_rate']:.2%} > {thresholds['max_error_rate']:.2%}")
+        level = thresholds["levels"].get(str(concurrency), {})
+        if "min_rps" in level and summary["rps"] < level["min_rps"]:
+            failures.append(f"c={concurrency}: {summary['rps']} req/s < {level['min_rps']}")
+        if "max_p95_ms" in level and summary["p95_ms"] > level["max_p95_ms"]:
+            failures.append(f"c={concurrency}: p95 {summary['p95_ms']} ms > {level['max_p95_ms']} ms")
+        for scenario, limits in thresholds.get("scenarios", {}).items():
+            stats = summary["scenarios"].get(scenario)
+            if stats and "max_p95_ms" in limits and stats["p95_ms"] > limits["max_p95_ms"]:
+                failures.append(f"c={concurrency}: {scenario} p95 {stats['p95_ms']} ms > {limits['max_p95_ms']} ms")
+    return failures
+
+
+# ----------------------------
+# Processes under test
+# ----------------------------
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_services(fakes):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_services.py"),
+         "--gemini-latency", str(fakes["gemini_latency"]), "--deepgram-latency", str(fakes["deepgram_latency"])],
+        stdout=subprocess.PIPE, text=True,
+    )
+    urls = dict(process.stdout.readline().strip().split("=", 1) for _ in range(2))
+    return process, urls
+
+
+def start_server(port, workers, config, service_urls):
+    fakes = config["fakes"]
+    env = {
+        **os.environ,
+        **config["server_env"],
+        **service_urls,
+        "GEMINI_API_KEY": "loadtest",
+        "DEEPGRAM_API_KEY": "loadtest",
+        "GOOGLE_SERVICE_ACCOUNT_JSON": "",  # Never mint real tokens, whatever .env says
+        "LOADTEST_FIRESTORE_READ_LATENCY": str(fakes["firestore_read_latency"]),
+        "LOADTEST_FIRESTORE_WRITE_LATENCY": str(fakes["firestore_write_latency"]),
+        "LOADTEST_CLOUDINARY_LATENCY": str(fakes["cloudinary_latency"]),
+    }
+    process = subprocess.Popen(
+        ["gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"), "--pythonpath", BENCH_DIR,
+         "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning", "load_server:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/startup", timeout=2).json().get("ready"):
+                return process, base_url
+        except (httpx.HTTPError, ValueError):
+            pass
+        if process.poll() is not None:
+            sys.exit("gunicorn exited during startup")
+        time.sleep(0.5)
+    process.terminate()
+    sys.exit("server did not become ready within 60 s")
+
+
+def main():
+    with open(CONFIG, encoding="utf-8") as f:
+        config = json.load(f)
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", default=",".join(str(level) for level in config["levels"]),
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=config["duration_seconds"], help="seconds per level")
+    parser.add_argument("--workers", type=int, default=config["workers"], help="gunicorn worker processes")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--no-thresholds", action="store_true", help="report only; never fail")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    fakes, service_urls = start_fake_services(config["fakes"])
+    server, base_url = None, None
+    try:
+        server, base_url = start_server(_free_port(), args.workers, config, service_urls)
+        print(f"gunicorn on {base_url}: {args.workers} worker(s), {args.duration:.0f}s per level, mix {config['mix']}")
+        workload = Workload()
+        results = {}
+        for concurrency in levels:
+            results[concurrency] = asyncio.run(run_level(base_url, workload, config, concurrency, args.duration))
+            print_level(concurrency, results[concurrency])
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        fakes.terminate()
+        fakes.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({str(level): summary for level, summary in results.items()}, f, indent=2)
+
+    if args.no_thresholds:
+        return
+    failures = check_thresholds(results, config["thresholds"])
+    if failures:
+        print("\nFAILED thresholds:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll thresholds met.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Stress check: many threads sharing one ZooAIModel must never see each other's
+per-request data (prefix, observation text, date).
+
+Deepgram and Gemini are replaced by in-process fakes that echo what they were
+sent after a short random delay, so every result can be checked against the
+request that produced it. Exits non-zero on the first mismatch.
+
+Run from the repository root:
+    python benchmarks/stress_zoo_model_threads.py [--threads 64] [--requests 2000]
+"""
+import os
+import re
+import sys
+import time
+import json
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DEEPGRAM_API_KEY", "stress-test")
+os.environ.setdefault("GEMINI_API_KEY", "stress-test")
+os.environ["GEMINI_OUTPUT_MODE"] = "schema"
+os.environ["GEMINI_RATE_LIMIT_RPM"] = "0"
+
+import requests
+
+import zoo_model_1762023720806 as zoo
+
+OBSERVATION_PATTERN = re.compile(r"Date: (\S+)\nObservation: (.*)$", re.S)
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+def fake_post(url, headers=None, params=None, data=None, json=None, timeout=None):
+    time.sleep(random.uniform(0, 0.005))
+    if "deepgram" in url:
+        # The "audio" is the UTF-8 transcript itself.
+        transcript = data.decode("utf-8")
+        return FakeResponse({"results": {"channels": [{"alternatives": [{"transcript": transcript}]}]}})
+
+    prompt = json["contents"][0]["parts"][0]["text"]
+    date, observation = OBSERVATION_PATTERN.search(prompt.rstrip()).groups()
+    reply = zoo.AnimalMonitoringData(
+        date_or_day=date,
+        animal_observed_on_time=True,
+        clean_drinking_water_provided=True,
+        enclosure_cleaned_properly=True,
+        normal_behaviour_status=True,
+        feed_and_supplements_available=True,
+        feed_given_as_prescribed=True,
+        other_animal_requirements=observation,
+        incharge_signature="Zoo Keeper",
+        daily_animal_health_monitoring=observation,
+        carnivorous_animal_feeding_chart="Standard",
+        medicine_stock_register="Adequate",
+        daily_wildlife_monitoring="Done",
+    ).model_dump_json()
+    return FakeResponse({
+        "candidates": [{"content": {"parts": [{"text": reply}]}}],
+        "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(reply) // 4},
+    })
+
+
+def one_request(model, i):
+    prefix = f"[keeper-{i}] "
+    transcript = f"note {i}: animal {random.choice(['ate', 'slept', 'roamed'])} at {i % 24}h"
+    date = f"2024-01-{i % 28 + 1:02d}"
+    if i % 2:
+        result = model.process_audio_observation(transcript.encode("utf-8"), date, prefix=prefix)
+        expected = prefix + transcript
+    else:
+        result = model.process_observation(transcript, date)
+        expected = transcript
+    if result.other_animal_requirements != expected or result.date_or_day != date:
+        raise AssertionError(f"request {i}: expected {expected!r} on {date}, got "
+                             f"{result.other_animal_requirements!r} on {result.date_or_day}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    requests.post = fake_post
+    model = zoo.get_zoo_model()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for future in [pool.submit(one_request, model, i) for i in range(args.requests)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.requests} requests on {args.threads} threads: all results matched their request")
+    print(f"elapsed {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s)")
+    print(f"transcript cache: {model.transcript_cache.stats()}")
+    print(f"gemini usage: {json.dumps(model.usage.snapshot())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+# Gunicorn picks this file up automatically (`gunicorn backend_api:app`).
+import os
+
+# ZooAIModel and the other shared clients are thread-safe, so each worker can
+# serve several requests at once (threads > 1 selects the gthread worker).
+# Every in-flight request, including one waiting on Gemini or Deepgram, holds
+# one of these threads, so threads x workers is the number of requests a
+# server can have in progress; the rest queue.
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+def post_worker_init(worker):
+    """Starts the write-behind flusher and loads Firestore, Cloudinary and the AI model in the background."""
+    from backend_api import start_background_warmup
+    start_background_warmup()
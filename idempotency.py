@@ -0,0 +1,245 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# ----------------------------
+# Idempotency keys for POST endpoints
+# ----------------------------
+# Offline retries from the service worker can deliver the same submission more
+# than once. A client that sends an `Idempotency-Key` header gets the stored
+# response back on every repeat instead of a second Gemini call, upload and
+# Firestore document. A repeat that arrives while the first request is still
+# running waits for its result. Failed (5xx) attempts are forgotten so that a
+# retry does the work again.
+#
+# In the shared SQLite store an in-progress key is leased to the process running
+# it for IDEMPOTENCY_LEASE_SECONDS and renewed in the background while the
+# request runs. If that worker crashes or is redeployed, the lease runs out and
+# the next retry takes the key over instead of waiting for a response that will
+# never come.
+
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "120"))
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", "30"))
+
+NEW = "new"
+DONE = "done"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+
+class StoredResponse:
+    """The parts of a Flask response needed to replay it."""
+
+    def __init__(self, body, status, mimetype):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+
+
+class MemoryIdempotencyStore:
+    """Per-process store; waiters block on a condition until the leader finishes."""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL_SECONDS, max_keys=IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        # In-progress keys are kept apart from finished ones so that trimming to
+        # max_keys never drops a request that is still running.
+        self._running = {}  # key -> fingerprint
+        self._entries = OrderedDict()  # key -> (fingerprint, created, StoredResponse)
+        self._changed = threading.Condition()
+
+    def _purge(self, now):
+        # Entries are kept in completion order, so the oldest are checked first.
+        while self._entries:
+            key, (_, created, _) = next(iter(self._entries.items()))
+            if now - created < self.ttl and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[key]
+
+    def begin(self, key, fingerprint):
+        """Claims `key`; returns (state, StoredResponse | None)."""
+        with self._changed:
+            self._purge(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] != fingerprint:
+                    return MISMATCH, None
+                return DONE, entry[2]
+            running = self._running.get(key)
+            if running is None:
+                self._running[key] = fingerprint
+                return NEW, None
+            if running != fingerprint:
+                return MISMATCH, None
+            return IN_PROGRESS, None
+
+    def wait(self, key, timeout=IDEMPOTENCY_WAIT_SECONDS):
+        """Blocks until `key` completes; returns its StoredResponse, or None."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while key in self._running:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return None
+                self._changed.wait(left)
+            entry = self._entries.get(key)
+            return entry[2] if entry else None
+
+    def complete(self, key, response):
+        with self._changed:
+            fingerprint = self._running.pop(key, None)
+            if fingerprint is not None:
+                self._entries[key] = (fingerprint, time.time(), response)
+            self._changed.notify_all()
+
+    def abandon(self, key):
+        with self._changed:
+            self._running.pop(key, None)
+            self._changed.notify_all()
+
+
+class SqliteIdempotencyStore:
+    """Store shared by all workers on the host through a SQLite file; waiters poll."""
+
+    POLL_SECONDS = 0.1
+
+    def __init__(self, path, ttl=IDEMPOTENCY_TTL_SECONDS, lease=IDEMPOTENCY_LEASE_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.lease = lease
+        self._held = {}  # key -> owner token, for keys this process is running
+        self._held_lock = threading.Lock()
+        self._renewer = None
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, fingerprint TEXT, "
+                "created REAL, status INTEGER, mimetype TEXT, body BLOB, owner TEXT, claimed_until REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(idempotency)")}
+            if "owner" not in columns:  # Stores created before in-progress keys were leased
+                conn.execute("ALTER TABLE idempotency ADD COLUMN owner TEXT")
+                conn.execute("ALTER TABLE idempotency ADD COLUMN claimed_until REAL")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def begin(self, key, fingerprint):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute("DELETE FROM idempotency WHERE created < ?", (now - self.ttl,))
+            row = conn.execute(
+                "SELECT fingerprint, status, mimetype, body, claimed_until FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] == fingerprint and row[1] is None and (row[4] or 0) < now:
+                # The worker running it stopped renewing its lease; take the key over.
+                conn.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                owner = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO idempotency (key, fingerprint, created, owner, claimed_until) VALUES (?, ?, ?, ?, ?)",
+                    (key, fingerprint, now, owner, now + self.lease),
+                )
+                conn.execute("COMMIT")
+                self._hold(key, owner)
+                return NEW, None
+            conn.execute("COMMIT")
+            stored_fingerprint, status, mimetype, body, _ = row
+            if stored_fingerprint != fingerprint:
+                return MISMATCH, None
+            if status is None:
+                return IN_PROGRESS, None
+            return DONE, StoredResponse(body, status, mimetype)
+        finally:
+            conn.close()
+
+    def wait(self, key, timeout=IDEMPOTENCY_WAIT_SECONDS):
+        """Polls until `key` completes; None when it was abandoned, its lease ran out, or on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT status, mimetype, body, claimed_until FROM idempotency WHERE key = ?", (key,)
+                ).fetchone()
+            finally:
+                conn.close()
+            if row is None:
+                return None
+            if row[0] is not None:
+                return StoredResponse(row[2], row[0], row[1])
+            if (row[3] or 0) < time.time():
+                return None  # Stale; the caller's next begin() takes it over.
+            time.sleep(self.POLL_SECONDS)
+        return None
+
+    def complete(self, key, response):
+        owner = self._release(key)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE idempotency SET status = ?, mimetype = ?, body = ?, claimed_until = NULL "
+                "WHERE key = ? AND owner = ?",
+                (response.status, response.mimetype, response.body, key, owner),
+            )
+        finally:
+            conn.close()
+
+    def abandon(self, key):
+        owner = self._release(key)
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM idempotency WHERE key = ? AND owner = ? AND status IS NULL", (key, owner))
+        finally:
+            conn.close()
+
+    # ----------------------------
+    # Leases
+    # ----------------------------
+    def _hold(self, key, owner):
+        with self._held_lock:
+            self._held[key] = owner
+            if self._renewer is None:
+                self._renewer = threading.Thread(target=self._renew_forever, name="idempotency-leases", daemon=True)
+                self._renewer.start()
+
+    def _release(self, key):
+        with self._held_lock:
+            return self._held.pop(key, None)
+
+    def _renew_forever(self):
+        while True:
+            time.sleep(self.lease / 3)
+            with self._held_lock:
+                held = list(self._held.items())
+            if not held:
+                continue
+            try:
+                conn = self._connect()
+                try:
+                    conn.executemany(
+                        "UPDATE idempotency SET claimed_until = ? WHERE key = ? AND owner = ?",
+                        [(time.time() + self.lease, key, owner) for key, owner in held],
+                    )
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not renew idempotency leases: {e}")
+
+
+def create_store():
+    """Memory store by default; set IDEMPOTENCY_STORE to a file path to share it between workers."""
+    path = os.environ.get("IDEMPOTENCY_STORE")
+    if path:
+        return SqliteIdempotencyStore(path)
+    return MemoryIdempotencyStore()
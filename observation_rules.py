@@ -0,0 +1,170 @@
+import re
+
+# ----------------------------
+# Rule-based fast path for routine observations
+# ----------------------------
+# Most keeper notes are routine ("fed, water changed, enclosure cleaned, animal
+# normal", "खाना दिया, पानी बदला, बाड़ा साफ किया"). extract_observation reads the
+# boolean AnimalMonitoringData fields from such notes with keyword patterns in
+# English, Hindi and romanised Hindi, and scores how sure it is. ZooAIModel
+# only calls Gemini when the score is below its threshold.
+#
+# The note is split into clauses; a clause that mentions a field's keywords
+# sets it to True, or to False when the clause is negated ("not cleaned",
+# "पानी नहीं बदला"). A field that is set both ways is a conflict, and any
+# conflict sends the note to Gemini. So does any clause the rules cannot
+# explain (one that matches no field, the all-well phrases or the abnormal
+# signs): "died at 5pm" or "tooth broken" must not be dropped from a note that
+# otherwise reads as routine. The fast path is only taken when every field is
+# settled; nothing is filled in by default.
+
+BOOLEAN_FIELDS = (
+    "animal_observed_on_time",
+    "clean_drinking_water_provided",
+    "enclosure_cleaned_properly",
+    "normal_behaviour_status",
+    "feed_and_supplements_available",
+    "feed_given_as_prescribed",
+)
+
+_CLAUSE_SPLIT = re.compile(r"[.,;:!?\n।|]+|\b(?:and|but|also|then|aur|lekin)\b|और|लेकिन|तथा", re.IGNORECASE)
+
+# Negations, and words reporting a lapse ("dirty water", "trough empty").
+# Devanagari vowel signs are not \w, so Hindi words are delimited by whitespace.
+_NEGATION = re.compile(
+    r"\b(?:not|no|never|without|didn'?t|did not|doesn'?t|does not|wasn'?t|was not|isn'?t|is not|"
+    r"hasn'?t|has not|haven'?t|skipp\w*|missed|dirty|empty|stale|out of stock|unavailable|finished|"
+    r"nahi|nahin|nhi|na|ganda|gandi|khali|khatam)\b"
+    r"|(?<!\S)(?:नहीं|नही|ना|न|गंदा|गंदी|गंदे|खाली|खत्म)(?!\S)",
+    re.IGNORECASE,
+)
+
+# Phrases that contain a negation word but report that all is well.
+_ALL_WELL = re.compile(
+    r"\bno (?:issues?|problems?|concerns?|abnormalit\w*|signs? of (?:illness|distress|injury)|complaints?)\b"
+    r"|\bnothing (?:unusual|abnormal)\b|\b(?:koi )?(?:dikkat|samasya|pareshani) nahi\b"
+    r"|कोई (?:दिक्कत|समस्या|परेशानी) नहीं|सब ठीक",
+    re.IGNORECASE,
+)
+
+# Signs that behaviour is not normal, whatever else the clause says, and events
+# (death, escape, birth, medical care) that always need a full write-up.
+_ABNORMAL = re.compile(
+    r"\b(?:letharg\w*|sluggish|limp\w*|lame|aggressive|restless|vomit\w*|diarrh\w*|sick|ill|weak|"
+    r"injur\w*|wound\w*|bleed\w*|swollen|cough\w*|abnormal\w*|unusual\w*|distress\w*|pacing|"
+    r"died|dead|death|deceased|carcass|escap\w*|missing|gave birth|birth|born|calv\w*|pregnan\w*|"
+    r"vet|veterinar\w*|medic\w*|treat\w*|dental|tooth|teeth|fractur\w*|broken|fever|infect\w*|"
+    r"seizure\w*|parasit\w*|ticks?|worms?|sust|bimar|ghayal|mar gay\w*|maut|bhag gay\w*|janam|"
+    r"dawai|dawa|ilaj|bukhar)\b|not eating|off (?:its |his |her |their )?food|loss of appetite|"
+    r"refus\w* (?:food|feed|meal|to eat)|(?:did not|didn'?t) eat|khana nahi kha\w*"
+    r"|सुस्त|बीमार|घायल|लंगड़|उल्टी|दस्त|कमजोर|आक्रामक|असामान्य|खाना नहीं खा"
+    r"|मर गय|मृत|मौत|भाग गय|लापता|जन्म|बच्चा दिया|गर्भ|डॉक्टर|दवा|इलाज|बुखार|दांत|टूट",
+    re.IGNORECASE,
+)
+
+_FIELD_KEYWORDS = {
+    "animal_observed_on_time": re.compile(
+        r"\b(?:seen|sighted|spotted|observed|visible|present|came out|on time|dikha|dikhai)\b"
+        r"|दिखा|दिखाई|देखा|मौजूद|समय पर",
+        re.IGNORECASE,
+    ),
+    "clean_drinking_water_provided": re.compile(
+        r"\b(?:water|drinking|trough|refill\w*|pani|paani)\b|पानी",
+        re.IGNORECASE,
+    ),
+    "enclosure_cleaned_properly": re.compile(
+        # "clean water" is about the water, not the enclosure.
+        r"\b(?:clean(?:ed|ing)?(?!\s+(?:drinking\s+)?water)|enclosure|cage|den|swept|sweep\w*|wash\w*|"
+        r"dung removed|saf(?!\s+pani)|safai|safayi)\b"
+        r"|साफ(?!\s*पानी)|सफाई|बाड़ा|बाड़े|पिंजरा|पिंजरे|धुला|धोया",
+        re.IGNORECASE,
+    ),
+    "normal_behaviour_status": re.compile(
+        r"\b(?:normal\w*|active|healthy|fine|alert|playful|calm|behaving well|behaviour ok|"
+        r"theek|thik|sahi|swasth|chust)\b|सामान्य|ठीक|स्वस्थ|सक्रिय|चुस्त|फुर्तीला",
+        re.IGNORECASE,
+    ),
+    "feed_and_supplements_available": re.compile(
+        r"\b(?:fed|feed\w*|food|meal|ration|diet|supplement\w*|vitamin\w*|calcium|meat|fodder|hay|"
+        r"fruits?|vegetables?|leaves|grass|fish|chicken|rabbits?|khana|chara|bhojan)\b|खाना|भोजन|चारा|आहार|सप्लीमेंट|विटामिन|मांस",
+        re.IGNORECASE,
+    ),
+    "feed_given_as_prescribed": re.compile(
+        r"\b(?:fed|feed\w*|food|meal|ration|diet|ate|eaten|eating|meat|fodder|hay|fruits?|vegetables?|"
+        r"leaves|grass|fish|chicken|rabbits?|khana|khaya|chara)\b"
+        r"|खाना|भोजन|चारा|आहार|खाया|खिलाया|मांस",
+        re.IGNORECASE,
+    ),
+}
+
+# Seeing how an animal behaves or eats means it was seen.
+_IMPLIES_OBSERVED = ("normal_behaviour_status", "feed_given_as_prescribed")
+
+
+class RuleExtraction:
+    """Boolean field values found in a note, plus how confident the rules are."""
+
+    def __init__(self, values, confidence, conflicts, abnormal_details, unexplained=()):
+        self.values = values
+        self.confidence = confidence
+        self.conflicts = conflicts
+        self.abnormal_details = abnormal_details
+        self.unexplained = list(unexplained)
+
+    @property
+    def complete(self):
+        """True when the note settled every boolean field."""
+        return len(self.values) == len(BOOLEAN_FIELDS)
+
+    def as_fields(self):
+        """The settled boolean fields; only use on a complete extraction."""
+        return {field: self.values[field] for field in BOOLEAN_FIELDS if field in self.values}
+
+
+def _clauses(text):
+    return [clause.strip() for clause in _CLAUSE_SPLIT.split(text or "") if clause and clause.strip()]
+
+
+def extract_observation(text):
+    """
+    Read the boolean fields from a keeper note. Confidence is the share of
+    fields the note settles, and 0 when any field is contradicted or any
+    clause is unexplained; notes describing abnormal behaviour are capped at
+    0.5 so that Gemini writes their details.
+    """
+    found = {field: set() for field in BOOLEAN_FIELDS}
+    abnormal, unexplained = [], []
+
+    for clause in _clauses(text):
+        explained = False
+        if _ALL_WELL.search(clause):
+            found["normal_behaviour_status"].add(True)
+            clause = _ALL_WELL.sub(" ", clause)
+            explained = True
+        if _ABNORMAL.search(clause):
+            found["normal_behaviour_status"].add(False)
+            found["animal_observed_on_time"].add(True)
+            abnormal.append(clause)
+            continue
+
+        negated = bool(_NEGATION.search(clause))
+        for field, keywords in _FIELD_KEYWORDS.items():
+            if keywords.search(clause):
+                explained = True
+                found[field].add(not negated)
+                if not negated and field in _IMPLIES_OBSERVED:
+                    found["animal_observed_on_time"].add(True)
+        if not explained:
+            unexplained.append(clause)
+
+    values, conflicts = {}, []
+    for field, seen in found.items():
+        if len(seen) == 1:
+            values[field] = next(iter(seen))
+        elif seen:
+            conflicts.append(field)
+
+    confidence = 0.0 if conflicts or unexplained else len(values) / len(BOOLEAN_FIELDS)
+    if abnormal:
+        confidence = min(confidence, 0.5)
+    return RuleExtraction(values, round(confidence, 3), conflicts, "; ".join(abnormal) or None, unexplained)
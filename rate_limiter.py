@@ -0,0 +1,226 @@
+import os
+import time
+import heapq
+import sqlite3
+import itertools
+import threading
+from collections import deque
+
+from resilience import CallNotAttempted, remaining_budget
+
+# ----------------------------
+# Client-side rate limiting for quota-limited APIs (Gemini)
+# ----------------------------
+# A token bucket refilled at `rate_per_minute`, holding at most `burst` tokens.
+# Callers wait in a priority queue: the head of the queue takes the next token,
+# so urgent work (SOS, poor health) is never stuck behind routine notes. The
+# bucket lives in memory (one process) or in a small SQLite file so that all
+# gunicorn workers on a machine share one quota. Queue priority is per process.
+
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+
+
+class RateLimitTimeout(CallNotAttempted):
+    """Raised when no token became available within the caller's budget."""
+
+
+class LocalTokenBucket:
+    """In-process token bucket, shared by all threads."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Takes one token; returns 0 on success, else seconds until one is due."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+
+class SqliteTokenBucket:
+    """Token bucket stored in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path, rate_per_minute, burst, name="gemini"):
+        self.path = path
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS token_bucket (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute(
+                "INSERT OR IGNORE INTO token_bucket VALUES (?, ?, ?)", (name, float(burst), time.time())
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads.
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def take(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            tokens, updated = conn.execute(
+                "SELECT tokens, updated FROM token_bucket WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute("UPDATE token_bucket SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, self.name))
+            conn.execute("COMMIT")
+            return wait
+        finally:
+            conn.close()
+
+
+class RateLimiter:
+    """Priority-queued access to a token bucket, with queue and wait-time metrics."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self._lock = threading.Lock()  # Queue and metrics only; never held across bucket I/O
+        self._head_changed = threading.Condition(self._lock)
+        self._take_lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._waits = deque(maxlen=500)
+        self._acquired = 0
+        self._timeouts = 0
+
+    # ----------------------------
+    # Queue bookkeeping
+    # ----------------------------
+    def _enqueue(self, priority):
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+            if self._queue[0] == ticket:
+                # The previous head may be sleeping until its token is due.
+                self._head_changed.notify_all()
+        return ticket
+
+    def _remove(self, ticket):
+        """Drops `ticket` from the queue, waking the waiters if it was the head. Caller holds _lock."""
+        was_head = self._queue[0] == ticket
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        if was_head:
+            self._head_changed.notify_all()
+
+    def _try_take(self, ticket):
+        """0 when `ticket` got a token, None when it is not at the head, else seconds until one is due."""
+        with self._take_lock:
+            with self._lock:
+                if self._queue[0] != ticket:
+                    return None
+            wait = self.bucket.take()
+            if wait == 0:
+                with self._lock:
+                    # A more urgent ticket may have been queued meanwhile.
+                    self._remove(ticket)
+            return wait
+
+    def _wait_turn(self, ticket, wait, delay):
+        """Sleeps `delay` seconds (None: no limit), waking early if the head of the queue changes."""
+        with self._lock:
+            # Re-check under the lock so a head change since _try_take is not missed.
+            if wait is not None or self._queue[0] != ticket:
+                self._head_changed.wait(delay)
+
+    def _leave(self, ticket, waited, acquired):
+        with self._lock:
+            if not acquired:
+                self._remove(ticket)
+                self._timeouts += 1
+            else:
+                self._acquired += 1
+                self._waits.append(waited)
+
+    def _sleep_for(self, wait, started, timeout):
+        """How long to wait for `wait` seconds (None: the next head change) within the budget."""
+        budget = remaining_budget()
+        if timeout is not None:
+            left = timeout - (time.monotonic() - started)
+            budget = left if budget is None else min(budget, left)
+        if budget is not None and budget <= 0:
+            raise RateLimitTimeout("Timed out waiting for a rate limit token")
+        if wait is None:
+            return budget
+        return wait if budget is None else min(wait, budget)
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def acquire(self, priority=PRIORITY_NORMAL, timeout=None):
+        """Blocks until a token is available; returns the seconds spent waiting."""
+        started = time.monotonic()
+        ticket = self._enqueue(priority)
+        acquired = False
+        try:
+            while True:
+                wait = self._try_take(ticket)
+                if wait == 0:
+                    acquired = True
+                    return time.monotonic() - started
+                self._wait_turn(ticket, wait, self._sleep_for(wait, started, timeout))
+        finally:
+            self._leave(ticket, time.monotonic() - started, acquired)
+
+    def metrics(self):
+        """Current queue depth plus wait-time statistics over the last 500 acquisitions."""
+        with self._lock:
+            waits = sorted(self._waits)
+            queue_depth = len(self._queue)
+            acquired, timeouts = self._acquired, self._timeouts
+        return {
+            "queue_depth": queue_depth,
+            "acquired": acquired,
+            "timeouts": timeouts,
+            "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_wait_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+            "max_wait_seconds": round(waits[-1], 3) if waits else 0.0,
+        }
+
+
+# ----------------------------
+# Shared Gemini limiter
+# ----------------------------
+_gemini_limiter = None
+_gemini_limiter_lock = threading.Lock()
+
+def get_gemini_limiter():
+    """
+    Return the process-wide Gemini limiter, or None when limiting is disabled
+    (GEMINI_RATE_LIMIT_RPM=0). Set GEMINI_RATE_LIMIT_STORE to a file path to
+    share the quota between workers.
+    """
+    global _gemini_limiter
+    rate_per_minute = float(os.environ.get("GEMINI_RATE_LIMIT_RPM", "15"))
+    if rate_per_minute <= 0:
+        return None
+    with _gemini_limiter_lock:
+        if _gemini_limiter is None:
+            burst = int(os.environ.get("GEMINI_RATE_LIMIT_BURST", "5"))
+            store = os.environ.get("GEMINI_RATE_LIMIT_STORE")
+            if store:
+                bucket = SqliteTokenBucket(store, rate_per_minute, burst)
+            else:
+                bucket = LocalTokenBucket(rate_per_minute, burst)
+            _gemini_limiter = RateLimiter(bucket)
+    return _gemini_limiter
@@ -0,0 +1,249 @@
+import os
+import time
+import random
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# ----------------------------
+# Resilience layer for external calls (Gemini, Deepgram, Cloudinary)
+# ----------------------------
+# Every outbound call goes through resilient_call, which gives it:
+#   * bounded retries with full-jitter exponential backoff for retryable
+#     status codes and transport errors,
+#   * a per-dependency circuit breaker that fails fast while the dependency
+#     is known to be down,
+#   * a per-request deadline budget, so the attempts (and the sleeps between
+#     them) of one request never add up to more than a known bound.
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+MAX_ATTEMPTS = int(os.environ.get("EXTERNAL_CALL_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE_SECONDS = float(os.environ.get("EXTERNAL_CALL_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX_SECONDS = float(os.environ.get("EXTERNAL_CALL_BACKOFF_MAX", "8"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "30"))
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "60"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request's deadline budget has run out."""
+
+
+class CallNotAttempted(Exception):
+    """
+    Raised by `send` when it gave up before reaching the dependency (e.g. no
+    rate-limit token in time). It says nothing about the dependency's health,
+    so the circuit breaker ignores it.
+    """
+
+
+class RetryableStatusError(Exception):
+    """The last attempt returned a retryable HTTP status."""
+
+    def __init__(self, dependency, status_code):
+        super().__init__(f"{dependency} returned HTTP {status_code}")
+        self.status_code = status_code
+
+
+# ----------------------------
+# Circuit breaker
+# ----------------------------
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker. After `failure_threshold`
+    consecutive failed attempts it opens for `reset_seconds`; then a single trial
+    call is let through, and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go through now; True if this call is the trial."""
+        with self._lock:
+            state = self._state()
+            if state == "open" or (state == "half_open" and self._trial_in_flight):
+                raise CircuitOpenError(f"{self.name} circuit is open; failing fast")
+            if state == "half_open":
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Frees the half-open trial slot for a call that never reached the dependency."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    print(f"⚠️ Circuit for {self.name} opened after {self._failures} failures.")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(dependency):
+    """Return the process-wide breaker for a dependency, creating it on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(dependency)
+        if breaker is None:
+            breaker = _breakers[dependency] = CircuitBreaker(dependency)
+        return breaker
+
+def circuit_states():
+    """Current state of every breaker, e.g. {"gemini": "closed"}."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.state for breaker in breakers}
+
+
+# ----------------------------
+# Deadline budget
+# ----------------------------
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+@contextmanager
+def request_deadline(seconds=REQUEST_DEADLINE_SECONDS):
+    """
+    Bound everything inside the block to `seconds`. Nested blocks keep the
+    outer (earlier) deadline, so one request never gets a fresh budget halfway.
+    """
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None and current <= expires_at:
+        yield
+        return
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def with_request_deadline(func):
+    """Decorator running a function under request_deadline()."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with request_deadline():
+            return func(*args, **kwargs)
+    return wrapper
+
+def remaining_budget():
+    """Seconds left in the current request's deadline, or None if there is none."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+def _attempt_timeout(timeout):
+    budget = remaining_budget()
+    if budget is None:
+        return timeout
+    if budget <= 0:
+        raise DeadlineExceeded("Request deadline exceeded before the call could be made")
+    return min(timeout, budget)
+
+def _backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given (1-based) attempt."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))))
+
+def _fits_in_budget(delay):
+    budget = remaining_budget()
+    return budget is None or delay < budget
+
+
+# ----------------------------
+# Retry classification
+# ----------------------------
+def is_retryable_error(exc):
+    """Transport-level failures worth retrying (connection resets, timeouts)."""
+    if isinstance(exc, (RetryableStatusError, TimeoutError, ConnectionError)):
+        return True
+    try:
+        import requests
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+    except ImportError:
+        pass
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return False
+
+def _check_status(dependency, result):
+    status_code = getattr(result, "status_code", None)
+    if status_code in RETRYABLE_STATUS_CODES:
+        raise RetryableStatusError(dependency, status_code)
+    return result
+
+
+# ----------------------------
+# Entry points
+# ----------------------------
+def resilient_call(dependency, send, timeout, retryable=is_retryable_error):
+    """
+    Call `send(timeout)` for `dependency` with retries, backoff, the circuit
+    breaker and the deadline budget applied. `send` performs one attempt and
+    returns a response (anything with `status_code`) or a plain result.
+    """
+    breaker = get_breaker(dependency)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        attempt_timeout = _attempt_timeout(timeout)
+        trial = breaker.before_call()
+        try:
+            result = _check_status(dependency, send(attempt_timeout))
+        except CallNotAttempted:
+            if trial:
+                breaker.release_trial()
+            raise
+        except Exception as e:
+            if not retryable(e):
+                # The dependency answered; the request itself was bad.
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            delay = _backoff_delay(attempt)
+            if attempt == MAX_ATTEMPTS or breaker.state == "open" or not _fits_in_budget(delay):
+                raise
+            print(f"⚠️ {dependency} call failed ({e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
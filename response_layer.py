@@ -0,0 +1,143 @@
+import os
+import gzip
+import base64
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# ----------------------------
+# Response layer: fast JSON + negotiated compression
+# ----------------------------
+# init_response_layer(app) swaps Flask's stdlib JSON provider for orjson and
+# compresses large text responses with brotli or gzip, whichever the client
+# accepts (brotli preferred). Firestore values (timestamps, references, geo
+# points) are encoded natively, timestamps as ISO 8601.
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/plain",
+    "text/html",
+}
+
+
+def json_default(value):
+    """Encode values the JSON encoders do not know, including Firestore types."""
+    if isinstance(value, (datetime, date)):  # Includes DatetimeWithNanoseconds
+        return value.isoformat()
+    if hasattr(value, "model_dump"):  # pydantic models such as AnimalMonitoringData
+        return value.model_dump()
+    if hasattr(value, "latitude") and hasattr(value, "longitude"):  # GeoPoint
+        return {"latitude": value.latitude, "longitude": value.longitude}
+    if hasattr(value, "path") and hasattr(value, "id"):  # DocumentReference
+        return value.path
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify and request.get_json."""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            kwargs.setdefault("default", json_default)
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        # Skip the bytes -> str -> bytes round trip of dumps().
+        body = orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encoding):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response, accept_encoding):
+    """Compress `response` in place when it is large, textual and the client allows it."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_response_layer(app):
+    """Install the fast JSON provider and the compression hook on a Flask app."""
+    from flask import request
+
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request.headers.get("Accept-Encoding"))
+
+    return app
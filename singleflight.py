@@ -0,0 +1,62 @@
+import threading
+
+# ----------------------------
+# Single-flight request coalescing
+# ----------------------------
+# When several callers ask for the same key at the same time, only the first
+# (the leader) does the work; the others wait for and share its result. Nothing
+# is cached: once the leader finishes, the next caller starts a fresh call.
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """
+        Run `fn()` for `key`, or wait for the identical call already in flight.
+        Returns (result, shared) where `shared` is True for callers that reused
+        another call's result. Exceptions from `fn` are re-raised in every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), "executed": self.executed, "shared": self.shared}
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import atexit
+import secrets
+import sqlite3
+import string
+import threading
+
+from response_layer import json_default
+from resilience import is_retryable_error
+
+# ----------------------------
+# Write-behind buffer for Firestore inserts
+# ----------------------------
+# enqueue() writes a record to a local SQLite journal (fsynced) and returns the
+# document id straight away; a background thread commits journaled records to
+# Firestore in batches every FLUSH_SECONDS, or sooner once MAX_BATCH are
+# waiting. Document ids are chosen up front and written with set(), so a batch
+# that is committed twice (crash between commit and journal cleanup, or two
+# workers sharing a journal) still yields one document. Whatever is left in the
+# journal is flushed when the next process starts.
+#
+# A batch that fails is retried with exponential backoff (the rows are leased
+# until the next attempt, so later rows are not held up). Once a row has failed
+# MAX_ATTEMPTS times its batch is committed one row at a time, and rows that
+# Firestore rejects on their own are moved to the dead_letter_writes table for
+# an operator to inspect and replay.
+
+FLUSH_SECONDS = float(os.environ.get("WRITE_BEHIND_FLUSH_SECONDS", "0.5"))
+MAX_BATCH = min(500, int(os.environ.get("WRITE_BEHIND_MAX_BATCH", "200")))  # Firestore caps a batch at 500
+CLAIM_SECONDS = 60.0
+MAX_ATTEMPTS = int(os.environ.get("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+BACKOFF_MAX_SECONDS = 300.0
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def new_document_id():
+    """A 20-character id in the same shape as Firestore's auto-generated ones."""
+    return "".join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+
+def _is_outage(exc):
+    """Failures that say nothing about the record itself: Firestore is unreachable or overloaded."""
+    if is_retryable_error(exc):
+        return True
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    return isinstance(exc, (
+        exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.InternalServerError,
+        exceptions.TooManyRequests, exceptions.ResourceExhausted, exceptions.Aborted, exceptions.Unauthenticated,
+    ))
+
+
+class WriteBehindBuffer:
+    """Journal-backed insert buffer; `get_db` returns the Firestore client (or None)."""
+
+    def __init__(self, path, get_db, flush_seconds=FLUSH_SECONDS, max_batch=MAX_BATCH, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.get_db = get_db
+        self.flush_seconds = flush_seconds
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flushed = 0
+        self._failed_batches = 0
+        self._last_commit_seconds = None
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_writes (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "collection TEXT, doc_id TEXT, data TEXT, created REAL, claimed_until REAL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(pending_writes)")}
+            if "attempts" not in columns:  # Journals written before retries were counted
+                conn.execute("ALTER TABLE pending_writes ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE pending_writes ADD COLUMN last_error TEXT")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_letter_writes (seq INTEGER PRIMARY KEY, "
+                "collection TEXT, doc_id TEXT, data TEXT, created REAL, attempts INTEGER, error TEXT, failed_at REAL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        # FULL makes every commit durable before enqueue() returns, WAL included.
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    # ----------------------------
+    # Producer side
+    # ----------------------------
+    def enqueue(self, collection, data):
+        """Journal one insert and return its document id; Firestore is written later."""
+        doc_id = new_document_id()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO pending_writes (collection, doc_id, data, created) VALUES (?, ?, ?, ?)",
+                (collection, doc_id, json.dumps(data, default=json_default), time.time()),
+            )
+            pending = conn.execute("SELECT COUNT(*) FROM pending_writes").fetchone()[0]
+        finally:
+            conn.close()
+        self.start()
+        if pending >= self.max_batch:
+            self._wake.set()
+        return doc_id
+
+    # ----------------------------
+    # Flusher
+    # ----------------------------
+    def start(self):
+        """Start the flusher thread once per process; it also replays any leftover journal."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        """Flush what can be flushed within `timeout`; the rest stays journaled."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                while self.flush_once() == self.max_batch:
+                    pass  # A full batch means more may be waiting.
+            except Exception as e:
+                with self._lock:
+                    self._failed_batches += 1
+                print(f"⚠️ Write-behind flush failed, will retry: {e}")
+                if self._stopping:
+                    return
+                time.sleep(self.flush_seconds)
+            if self._stopping:
+                return
+
+    def _claim(self, conn):
+        """Lease up to max_batch journaled rows to this process."""
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT seq, collection, doc_id, data, attempts FROM pending_writes "
+            "WHERE claimed_until IS NULL OR claimed_until < ? ORDER BY seq LIMIT ?",
+            (now, self.max_batch),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE pending_writes SET claimed_until = ? WHERE seq = ?",
+            [(now + CLAIM_SECONDS, row[0]) for row in rows],
+        )
+        conn.execute("COMMIT")
+        return rows
+
+    def _retry_later(self, conn, rows, error):
+        """Count a failed attempt and lease the rows until their backoff has passed."""
+        now = time.time()
+        conn.executemany(
+            "UPDATE pending_writes SET attempts = attempts + 1, last_error = ?, claimed_until = ? WHERE seq = ?",
+            [(str(error), now + min(BACKOFF_MAX_SECONDS, self.flush_seconds * 2 ** row[4]), row[0]) for row in rows],
+        )
+
+    def _dead_letter(self, conn, row, error):
+        seq, collection, doc_id, data, attempts = row
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT OR REPLACE INTO dead_letter_writes VALUES (?, ?, ?, ?, "
+            "(SELECT created FROM pending_writes WHERE seq = ?), ?, ?, ?)",
+            (seq, collection, doc_id, data, seq, attempts + 1, str(error), time.time()),
+        )
+        conn.execute("DELETE FROM pending_writes WHERE seq = ?", (seq,))
+        conn.execute("COMMIT")
+        print(f"❌ Write-behind gave up on {collection}/{doc_id} (journal seq {seq}): {error}")
+
+    def _flush_rows_individually(self, db, conn, rows):
+        """Commit rows one by one, dead-lettering those Firestore rejects; stops at an outage."""
+        written = 0
+        for index, row in enumerate(rows):
+            seq, collection, doc_id, data, _ = row
+            try:
+                db.collection(collection).document(doc_id).set(json.loads(data))
+            except Exception as e:
+                if _is_outage(e):
+                    self._retry_later(conn, rows[index:], e)
+                    raise
+                self._dead_letter(conn, row, e)
+                continue
+            conn.execute("DELETE FROM pending_writes WHERE seq = ?", (seq,))
+            written += 1
+        with self._lock:
+            self._flushed += written
+        return len(rows)
+
+    def flush_once(self):
+        """Commit one batch to Firestore; returns the number of records taken off the journal."""
+        db = self.get_db()
+        if db is None:
+            return 0
+        conn = self._connect()
+        try:
+            rows = self._claim(conn)
+            if not rows:
+                return 0
+            if max(row[4] for row in rows) >= self.max_attempts:
+                return self._flush_rows_individually(db, conn, rows)
+            started = time.perf_counter()
+            try:
+                batch = db.batch()
+                for _, collection, doc_id, data, _ in rows:
+                    batch.set(db.collection(collection).document(doc_id), json.loads(data))
+                batch.commit()
+            except Exception as e:
+                self._retry_later(conn, rows, e)
+                raise
+            elapsed = time.perf_counter() - started
+            conn.executemany("DELETE FROM pending_writes WHERE seq = ?", [(row[0],) for row in rows])
+        finally:
+            conn.close()
+        with self._lock:
+            self._flushed += len(rows)
+            self._last_commit_seconds = round(elapsed, 3)
+        return len(rows)
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            pending, oldest = conn.execute("SELECT COUNT(*), MIN(created) FROM pending_writes").fetchone()
+            dead_letter = conn.execute("SELECT COUNT(*) FROM dead_letter_writes").fetchone()[0]
+        finally:
+            conn.close()
+        with self._lock:
+            return {
+                "pending": pending,
+                "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+                "flushed": self._flushed,
+                "failed_batches": self._failed_batches,
+                "dead_letter": dead_letter,
+                "last_commit_seconds": self._last_commit_seconds,
+            }
+
+
+def create_buffer(get_db):
+    """None (inserts go straight to Firestore) unless WRITE_BEHIND_JOURNAL names a journal file."""
+    path = os.environ.get("WRITE_BEHIND_JOURNAL")
+    if path:
+        return WriteBehindBuffer(path, get_db)
+    return None
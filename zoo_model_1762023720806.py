@@ -1,9 +1,24 @@
 import os
+import re
+import time
+import hashlib
+import threading
+import contextvars
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from pydantic import BaseModel, Field
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-import google.generativeai as genai
+from resilience import remaining_budget, resilient_call, with_request_deadline
+from rate_limiter import PRIORITY_NORMAL, PRIORITY_URGENT, get_gemini_limiter
+from audio_segments import split_audio
+from observation_rules import extract_observation
+
+# Segments of one long recording sent to Deepgram at the same time.
+TRANSCRIBE_MAX_PARALLEL = int(os.environ.get("TRANSCRIBE_MAX_PARALLEL", "4"))
+
+# langchain and google.generativeai are imported inside ZooAIModel.__init__ so
+# that importing this module (and booting the API) stays cheap. The model itself
+# is built on first use through get_zoo_model().
 
 # ----------------------------
 # Schema for structured data
@@ -25,15 +40,164 @@ class AnimalMonitoringData(BaseModel):
     daily_wildlife_monitoring: str = Field(..., description="Summary of daily wildlife monitoring observations")
 
 
+# ----------------------------
+# Transcript cache
+# ----------------------------
+class TranscriptCache:
+    """
+    LRU cache of Deepgram transcripts keyed by a hash of the audio bytes and the
+    request parameters (model, language), so a re-uploaded clip is not sent to
+    Deepgram again. Bounded by total transcript size and entry count.
+    """
+
+    def __init__(self, max_bytes=None, max_entries=None):
+        self.max_bytes = max_bytes or int(os.environ.get("TRANSCRIPT_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+        self.max_entries = max_entries or int(os.environ.get("TRANSCRIPT_CACHE_MAX_ENTRIES", "2000"))
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(audio_bytes, params):
+        digest = hashlib.sha256(audio_bytes)
+        for name in sorted(params):
+            digest.update(f"|{name}={params[name]}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            transcript = self._entries.get(key)
+            if transcript is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return transcript
+
+    def put(self, key, transcript):
+        size = len(transcript.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key).encode("utf-8"))
+            self._entries[key] = transcript
+            self._size += size
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.encode("utf-8"))
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+# ----------------------------
+# Gemini queue priority
+# ----------------------------
+_URGENT_PATTERN = re.compile(
+    r"\bsos\b|emergency|injur|bleed|collaps|unconscious|not breathing|health status: poor"
+    r"|\b(?:died|dead|death|escap\w*|missing|gave birth|birth|seizure\w*|fractur\w*)\b"
+    r"|आपात|घायल|खून|बेहोश|मर गय|मृत|मौत|भाग गय|लापता|जन्म",
+    re.IGNORECASE,
+)
+
+def observation_priority(observation_text, health_status=None):
+    """SOS and poor-health observations jump the Gemini rate-limit queue."""
+    if health_status == "poor" or _URGENT_PATTERN.search(observation_text or ""):
+        return PRIORITY_URGENT
+    return PRIORITY_NORMAL
+
+
+# ----------------------------
+# Gemini structured output helpers
+# ----------------------------
+def to_gemini_schema(json_schema):
+    """
+    Convert a pydantic JSON schema into the OpenAPI subset Gemini accepts as
+    responseSchema (upper-case types, `nullable` instead of anyOf-with-null,
+    no titles or defaults).
+    """
+    if "anyOf" in json_schema:
+        options = [option for option in json_schema["anyOf"] if option.get("type") != "null"]
+        converted = to_gemini_schema(options[0])
+        if len(options) < len(json_schema["anyOf"]):
+            converted["nullable"] = True
+        if "description" in json_schema:
+            converted["description"] = json_schema["description"]
+        return converted
+
+    converted = {"type": json_schema["type"].upper()}
+    if "description" in json_schema:
+        converted["description"] = json_schema["description"]
+    if json_schema["type"] == "object":
+        converted["properties"] = {
+            name: to_gemini_schema(prop) for name, prop in json_schema["properties"].items()
+        }
+        converted["required"] = json_schema.get("required", [])
+        # Keep Gemini's output in declaration order so replies diff cleanly.
+        converted["propertyOrdering"] = list(json_schema["properties"])
+    return converted
+
+
+class GeminiUsageStats:
+    """Thread-safe running totals of Gemini token usage and latency, per output mode."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, mode, usage_metadata, elapsed):
+        with self._lock:
+            totals = self._totals.setdefault(mode, {
+                "calls": 0, "prompt_tokens": 0, "output_tokens": 0, "total_seconds": 0.0,
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += usage_metadata.get("promptTokenCount", 0)
+            totals["output_tokens"] += usage_metadata.get("candidatesTokenCount", 0)
+            totals["total_seconds"] += elapsed
+
+    def snapshot(self):
+        """Per-mode totals plus per-call averages."""
+        with self._lock:
+            report = {}
+            for mode, totals in self._totals.items():
+                calls = totals["calls"]
+                report[mode] = {
+                    **totals,
+                    "total_seconds": round(totals["total_seconds"], 3),
+                    "avg_prompt_tokens": round(totals["prompt_tokens"] / calls, 1),
+                    "avg_output_tokens": round(totals["output_tokens"] / calls, 1),
+                    "avg_latency_seconds": round(totals["total_seconds"] / calls, 3),
+                }
+            return report
+
+
 # ----------------------------
 # Zoo AI Model with Deepgram
 # ----------------------------
 class ZooAIModel:
+    """
+    One instance is shared by every thread in a worker, so the
+    model keeps no per-request state: everything a call needs (text, date,
+    animal, prefix, priority) is passed as arguments. Attributes set in
+    __init__ are read-only afterwards. The shared pieces are thread-safe:
+    TranscriptCache and GeminiUsageStats take a lock, the rate limiter and the
+    circuit breakers lock internally, and calls use module-level requests.post
+    (no shared Session).
+    """
+
     def __init__(self):
         """Initialize Gemini LLM and Deepgram API."""
         # Gemini LLM
+        from langchain.prompts import PromptTemplate
+        from langchain.output_parsers import PydanticOutputParser
+
         gem_key = os.environ.get("GEMINI_API_KEY")
         if gem_key:
+            import google.generativeai as genai
             genai.configure(api_key=gem_key)
             self.llm = genai.GenerativeModel("gemini-pro")  # Using stable gemini-pro model
         else:
@@ -41,13 +205,26 @@ class ZooAIModel:
 
         # Deepgram API
         self.deepgram_key = os.environ.get("DEEPGRAM_API_KEY") # Keep for checking if key exists
-        self.deepgram_url = "https://api.deepgram.com/v1/listen"
-        self.prefix = "" # Add a prefix attribute
+        self.deepgram_url = os.environ.get("DEEPGRAM_API_URL", "https://api.deepgram.com/v1/listen")
+        # Using gemini-2.5-flash-lite (best free tier availability in 2025). Both URLs
+        # can be pointed at local fakes (see benchmarks/load_test.py).
+        self.gemini_url = os.environ.get(
+            "GEMINI_API_URL",
+            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent",
+        )
+        self.transcript_cache = TranscriptCache()
+
+        # Output mode: "prompt" pastes the parser's format instructions into every
+        # prompt and parses free text; "schema" sends AnimalMonitoringData as
+        # Gemini's responseSchema and validates the JSON reply directly.
+        self.output_mode = os.environ.get("GEMINI_OUTPUT_MODE", "prompt").lower()
+        self.usage = GeminiUsageStats()
+        # Routine notes the keyword rules are this sure about skip Gemini (> 1 disables).
+        self.rules_threshold = float(os.environ.get("OBSERVATION_RULES_THRESHOLD", "0.8"))
 
         # Parser & prompt
         self.parser = PydanticOutputParser(pydantic_object=AnimalMonitoringData)
-        self.prompt = PromptTemplate(
-            template="""
+        template = """
                 You are an expert zoo monitoring assistant. Your task is to analyze an observation log
                 for a specific animal and convert it into a structured JSON format.
 
@@ -63,36 +240,90 @@ class ZooAIModel:
                 {format_instructions}
 
                 Observation: {observation}
-            """,
+            """
+        self.prompt = PromptTemplate(
+            template=template,
             input_variables=["observation", "animal_name"],
             partial_variables={"format_instructions": self.parser.get_format_instructions()},
         )
+        # The schema travels in generationConfig, so the prompt needs no format dump.
+        self.schema_prompt = PromptTemplate(
+            template=template,
+            input_variables=["observation", "animal_name"],
+            partial_variables={"format_instructions": ""},
+        )
+        self.response_schema = to_gemini_schema(AnimalMonitoringData.model_json_schema())
 
     # ----------------------------
     # Deepgram Transcription
     # ----------------------------
+    def _deepgram_request(self, content_type, language=None):
+        """
+        Headers and query params for a Deepgram /listen call. With `language`
+        (detected on an earlier segment) detection is skipped.
+        """
+        headers = {
+            "Authorization": f"Token {self.deepgram_key}",
+            "Content-Type": content_type
+        }
+        params = {
+            "model": "nova-2",
+            "language": "hi",  # Hindi language
+            "detect_language": "true",  # Auto-detect Hindi/English
+        }
+        if language:
+            params["language"] = language
+            del params["detect_language"]
+        return headers, params
+
+    def _parse_deepgram_response(self, result):
+        """(transcript, detected language or None) from a /listen response."""
+        channel = result.get("results", {}).get("channels", [{}])[0]
+        return channel.get("alternatives", [{}])[0].get("transcript", ""), channel.get("detected_language")
+
+    def _stitch_transcripts(self, transcripts):
+        return " ".join(text.strip() for text in transcripts if text.strip()) or "No text returned by Deepgram"
+
+    def _transcribe_segment(self, audio_bytes, content_type, language=None):
+        headers, params = self._deepgram_request(content_type, language)
+        response = resilient_call("deepgram", lambda timeout: requests.post(
+            self.deepgram_url, headers=headers, params=params, data=audio_bytes, timeout=timeout
+        ), timeout=60)
+        response.raise_for_status()
+        return self._parse_deepgram_response(response.json())
+
+    @with_request_deadline
     def transcribe_audio(self, audio_bytes, content_type="audio/webm"):
-        """Transcribe audio using Deepgram API."""
+        """
+        Transcribe audio using Deepgram API. Long recordings are split at quiet
+        points (see audio_segments); the first segment is transcribed with
+        language detection, the rest in parallel in that language.
+        """
         if not self.deepgram_key:
             return "Audio transcription unavailable - Deepgram API key missing"
         
         try:
-            headers = {
-                "Authorization": f"Token {self.deepgram_key}",
-                "Content-Type": content_type
-            }
-            params = {
-                "model": "nova-2",
-                "language": "hi",  # Hindi language
-                "detect_language": "true",  # Auto-detect Hindi/English
-            }
-            response = requests.post(
-                self.deepgram_url, headers=headers, params=params, data=audio_bytes, timeout=60
-            )
-            response.raise_for_status()
-            result = response.json()
-            transcript = result.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
-            return transcript or "No text returned by Deepgram"
+            _, params = self._deepgram_request(content_type)
+            cache_key = TranscriptCache.key_for(audio_bytes, params)
+            cached = self.transcript_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            segments = split_audio(audio_bytes, content_type)
+            first, language = self._transcribe_segment(*segments[0])
+            transcripts = [first]
+            if len(segments) > 1:
+                with ThreadPoolExecutor(max_workers=min(TRANSCRIBE_MAX_PARALLEL, len(segments) - 1)) as pool:
+                    # Each task gets a copy of the caller's context so the deadline applies.
+                    futures = [
+                        pool.submit(contextvars.copy_context().run, self._transcribe_segment, data, kind, language)
+                        for data, kind in segments[1:]
+                    ]
+                    transcripts += [future.result()[0] for future in futures]
+
+            transcript = self._stitch_transcripts(transcripts)
+            self.transcript_cache.put(cache_key, transcript)
+            return transcript
 
         except Exception as e:
             print("Error transcribing audio:", e)
@@ -101,104 +332,168 @@ class ZooAIModel:
     # ----------------------------
     # AI Processing with Gemini (Service Account)
     # ----------------------------
-    def process_observation(self, observation_text, date, animal_name="Unknown"):
-        """Convert text observation into structured data using Gemini AI."""
-        try:
-            enhanced_observation = f"Date: {date}\nObservation: {observation_text}"
-            
-            # Try service account first, then fall back to API key
-            service_account_json = os.environ.get("GOOGLE_SERVICE_ACCOUNT_JSON")
-            api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("OPENAI_API_KEY") or os.environ.get("HUGGINGFACE_API_KEY")
-            
-            if service_account_json:
-                # Use service account authentication
-                import json
-                import requests
-                from google.oauth2 import service_account
-                from google.auth.transport.requests import Request
-                
-                # Parse service account credentials
-                credentials_dict = json.loads(service_account_json)
-                credentials = service_account.Credentials.from_service_account_info(
-                    credentials_dict,
-                    scopes=['https://www.googleapis.com/auth/generative-language']
-                )
-                
-                # Get access token
-                credentials.refresh(Request())
-                access_token = credentials.token
-                
-                # Using gemini-2.5-flash-lite (best free tier availability in 2025)
-                url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent"
-                
-                headers = {
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json"
-                }
-                
-                payload = {
-                    "contents": [{
-                        "parts": [{
-                            "text": self.prompt.format(observation=enhanced_observation, animal_name=animal_name)
-                        }]
+    def _gemini_request(self, observation_text, date, animal_name):
+        """
+        Build (url, headers, payload) for a generateContent call, or None when no
+        credentials are configured. Tries the service account first, then the API key.
+        """
+        enhanced_observation = f"Date: {date}\nObservation: {observation_text}"
+
+        service_account_json = os.environ.get("GOOGLE_SERVICE_ACCOUNT_JSON")
+        api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("OPENAI_API_KEY") or os.environ.get("HUGGINGFACE_API_KEY")
+
+        if self.output_mode == "schema":
+            payload = {
+                "contents": [{
+                    "parts": [{
+                        "text": self.schema_prompt.format(observation=enhanced_observation, animal_name=animal_name)
                     }]
-                }
-                
-                response = requests.post(url, json=payload, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                result_data = response.json()
-                json_text = result_data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-                
-                result = self.parser.parse(json_text)
-                
-                if hasattr(result, "date_or_day"):
-                    result.date_or_day = date
-
-                return result
-                
-            elif api_key:
-                # Fallback to API key authentication
-                import requests
-                
-                url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent?key={api_key}"
-                
-                headers = {"Content-Type": "application/json"}
-                payload = {
-                    "contents": [{
-                        "parts": [{
-                            "text": self.prompt.format(observation=enhanced_observation, animal_name=animal_name)
-                        }]
+                }],
+                "generationConfig": {
+                    "responseMimeType": "application/json",
+                    "responseSchema": self.response_schema,
+                },
+            }
+        else:
+            payload = {
+                "contents": [{
+                    "parts": [{
+                        "text": self.prompt.format(observation=enhanced_observation, animal_name=animal_name)
                     }]
-                }
-                
-                response = requests.post(url, json=payload, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                result_data = response.json()
-                json_text = result_data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-                
-                result = self.parser.parse(json_text)
-                
-                if hasattr(result, "date_or_day"):
-                    result.date_or_day = date
-
-                return result
-            else:
+                }]
+            }
+
+        if service_account_json:
+            # Use service account authentication
+            import json
+            from google.oauth2 import service_account
+            from google.auth.transport.requests import Request
+
+            # Parse service account credentials
+            credentials_dict = json.loads(service_account_json)
+            credentials = service_account.Credentials.from_service_account_info(
+                credentials_dict,
+                scopes=['https://www.googleapis.com/auth/generative-language']
+            )
+
+            # Get access token
+            credentials.refresh(Request())
+            access_token = credentials.token
+
+            url = self.gemini_url
+            headers = {
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            }
+            return url, headers, payload
+
+        if api_key:
+            # Fallback to API key authentication
+            url = f"{self.gemini_url}?key={api_key}"
+            headers = {"Content-Type": "application/json"}
+            return url, headers, payload
+
+        return None
+
+    def _parse_gemini_response(self, result_data, date, elapsed):
+        self.usage.record(self.output_mode, result_data.get("usageMetadata", {}), elapsed)
+        json_text = result_data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
+
+        if self.output_mode == "schema":
+            result = AnimalMonitoringData.model_validate_json(json_text)
+        else:
+            result = self.parser.parse(json_text)
+
+        if hasattr(result, "date_or_day"):
+            result.date_or_day = date
+
+        return result
+
+    def _post_gemini(self, url, payload, headers, priority):
+        """One rate-limited Gemini attempt, retried by the resilience layer."""
+        limiter = get_gemini_limiter()
+
+        def send(timeout):
+            if limiter:
+                limiter.acquire(priority)
+            return requests.post(url, json=payload, headers=headers, timeout=_bounded(timeout))
+
+        return resilient_call("gemini", send, timeout=30)
+
+    def _rule_based_result(self, observation_text, date, priority):
+        """
+        Structured data from the local keyword rules (see observation_rules), or
+        None when they are less sure than rules_threshold or leave any field
+        unsettled. Urgent notes always go to Gemini.
+        """
+        if priority == PRIORITY_URGENT:
+            return None
+        started = time.perf_counter()
+        extraction = extract_observation(observation_text)
+        if not extraction.complete or extraction.confidence < self.rules_threshold:
+            return None
+        result = self._rule_based_data(observation_text, date, extraction)
+        self.usage.record("rules", {}, time.perf_counter() - started)
+        return result
+
+    def _rule_based_data(self, observation_text, date, extraction):
+        """AnimalMonitoringData whose summaries state what the rules found, not the fallback templates."""
+        fields = extraction.as_fields()
+        fed = fields["feed_given_as_prescribed"]
+        stocked = fields["feed_and_supplements_available"]
+        return AnimalMonitoringData(
+            date_or_day=date,
+            **fields,
+            normal_behaviour_details=extraction.abnormal_details,
+            other_animal_requirements=observation_text,
+            incharge_signature="Zoo Keeper",
+            daily_animal_health_monitoring=f"Observation recorded on {date}: {observation_text}",
+            carnivorous_animal_feeding_chart="Feed given as prescribed" if fed else "Feed not given as prescribed",
+            medicine_stock_register=(
+                "Feed and supplements available" if stocked else "Feed or supplements not available"
+            ),
+            daily_wildlife_monitoring=(
+                f"Animal observed on time on {date}" if fields["animal_observed_on_time"]
+                else f"Animal not observed on time on {date}"
+            ),
+        )
+
+    @with_request_deadline
+    def process_observation(self, observation_text, date, animal_name="Unknown", priority=None):
+        """
+        Convert text observation into structured data, with the local rules for
+        routine notes and Gemini AI otherwise. `priority` orders the call in the
+        Gemini rate-limit queue; by default it is derived from the text (see
+        observation_priority).
+        """
+        try:
+            if priority is None:
+                priority = observation_priority(observation_text)
+            fast_result = self._rule_based_result(observation_text, date, priority)
+            if fast_result is not None:
+                return fast_result
+
+            gemini_request = self._gemini_request(observation_text, date, animal_name)
+            if gemini_request is None:
                 print("No authentication found, using fallback data")
                 return self._create_fallback_data(observation_text, date)
 
+            url, headers, payload = gemini_request
+            started = time.perf_counter()
+            response = self._post_gemini(url, payload, headers, priority)
+            response.raise_for_status()
+            return self._parse_gemini_response(response.json(), date, time.perf_counter() - started)
+
         except Exception as e:
             print(f"Error processing observation with AI: {e}")
             print("Using fallback data instead")
             return self._create_fallback_data(observation_text, date)
 
-
-
-    def process_audio_observation(self, audio_bytes, date, content_type="audio/webm", animal_name="Unknown"):
-        """Transcribe audio and process observation."""
+    @with_request_deadline
+    def process_audio_observation(self, audio_bytes, date, content_type="audio/webm", animal_name="Unknown", prefix=""):
+        """Transcribe audio and process observation. `prefix` is prepended to the transcript."""
         text = self.transcribe_audio(audio_bytes, content_type)
-        full_text = self.prefix + text
+        full_text = prefix + text
         if text.startswith("Error") or text.startswith("Audio transcription unavailable"):
             return self._create_fallback_data(text, date)
         return self.process_observation(full_text, date, animal_name)
@@ -226,5 +521,30 @@ class ZooAIModel:
         )
 
 
-# Instantiate global model
-zoo_model = ZooAIModel()
+def _bounded(timeout):
+    """Trim a per-attempt timeout to what is left of the request deadline."""
+    budget = remaining_budget()
+    return timeout if budget is None else max(0.1, min(timeout, budget))
+
+
+# ----------------------------
+# Shared model instance (built lazily)
+# ----------------------------
+_zoo_model = None
+_zoo_model_lock = threading.Lock()
+
+def get_zoo_model():
+    """Return the shared ZooAIModel, building it on first use."""
+    global _zoo_model
+    if _zoo_model is None:
+        with _zoo_model_lock:
+            if _zoo_model is None:
+                _zoo_model = ZooAIModel()
+    return _zoo_model
+
+
+def __getattr__(name):
+    # Keeps `from zoo_model_1762023720806 import zoo_model` working for older callers.
+    if name == "zoo_model":
+        return get_zoo_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")